@@ -1,6 +1,10 @@
-import json
+import asyncio
+import os
+import threading
 import time
-from typing import List, Optional
+from contextvars import copy_context
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional
 
 from azure.ai.projects.models import (
     AgentEventHandler,
@@ -10,9 +14,94 @@ from azure.ai.projects.models import (
     ThreadMessage,
     ThreadRun,
 )
-from gradio import ChatMessage
 from opentelemetry import trace
 
+try:
+    import orjson as _json
+except ImportError:  # orjson is an optional speed-up; the stdlib parser has the same loads/JSONDecodeError API
+    import json as _json
+
+# Per-event debug output is opt-in; errors and warnings are always printed
+_VERBOSE = os.environ.get("CHAT_DEBUG") == "1"
+
+# Per-step span attributes are only recorded when detailed tracing is requested
+_OTEL_DETAIL = os.environ.get("OTEL_DETAIL") == "1"
+
+# Streamed deltas are coalesced before being pushed to Gradio; status transitions always flush
+YIELD_INTERVAL_SECONDS = 0.04
+YIELD_MAX_PENDING_CHARS = 64
+_STREAM_END = object()
+FLUSH_EVENT_TYPES = frozenset({"thread_run", "run_step"})
+
+TOOL_TITLES = MappingProxyType(
+    {
+        "bing_grounding": "🔎 Searching Web Sources",
+        "generate_location_map": "🗺️ Generating Map",
+        "get_clients_for_today": "📅 Today's Clients",
+        "unknown_function": "🔍 Searching Web",
+    }
+)
+
+TOOL_STATUS_ICONS = MappingProxyType({"pending": "⏳", "done": "✅", "error": "❌"})
+
+
+def _rec(span) -> bool:
+    return bool(span) and getattr(span, "is_recording", lambda: False)()
+
+
+def _trunc(s: str, n: int) -> str:
+    return s if len(s) <= n else s[:n] + "..."
+
+
+def _format_shelf_layout(output: dict) -> Optional[str]:
+    return output["layout_visual"] if "layout_visual" in output else None
+
+
+def _format_item_stock(output: dict) -> Optional[str]:
+    if "stock" not in output:
+        return None
+    return f"{output['name']} (ID: {output['item_id']}): {output['stock']} units in stock."
+
+
+def _format_item_location(output: dict) -> Optional[str]:
+    if "location_id" not in output:
+        return None
+    return (
+        f"{output['name']} (ID: {output['item_id']}) is located at "
+        f"Shelf {output['location_id']}, Position {output['position']}."
+    )
+
+
+def _format_restock_items(output: dict) -> Optional[str]:
+    if "count" not in output:
+        return None
+    count = output["count"]
+    if count <= 0:
+        return "No items found needing restock."
+    items_str = ", ".join([f"{i['name']} ({i['current_stock']})" for i in output["low_stock_items"][:3]])
+    return f"Found {count} low stock items. Examples: {items_str}{'...' if count > 3 else ''}."
+
+
+# Tool-specific bubble text; a formatter returns None when the output lacks its fields
+TOOL_FORMATTERS: Mapping[str, Callable[[dict], Optional[str]]] = MappingProxyType(
+    {
+        "get_shelf_layout": _format_shelf_layout,
+        "check_item_stock": _format_item_stock,
+        "find_item_location": _format_item_location,
+        "get_items_needing_restock": _format_restock_items,
+    }
+)
+
+
+def format_generic_output(output, output_str: str) -> str:
+    """Bubble text for tool outputs without a dedicated formatter."""
+    if isinstance(output, dict):
+        if "message" in output:
+            return output["message"]
+        if "error" in output:
+            return f"Error: {output['error']}"
+    return f"Completed. Output: {_trunc(output_str, 1000)}"
+
 
 class nullcontext:
     def __init__(self, enter_result=None):
@@ -25,45 +114,142 @@ class nullcontext:
         pass
 
 
+def _drain_stream(stream, loop: asyncio.AbstractEventLoop, events: asyncio.Queue, stop: threading.Event) -> None:
+    """Iterate the agent stream on a worker thread, handing each event (or the failure) to the event loop."""
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed; nobody is listening any more
+            stop.set()
+
+    try:
+        for item in stream:
+            if stop.is_set():
+                break
+            put(item)
+    except Exception as ex:
+        put(ex)
+    finally:
+        put(_STREAM_END)
+
+
 class EventHandler(AgentEventHandler):
     def __init__(self, tracer=None):
         super().__init__()
         self._current_message_id = None
-        self._accumulated_text = ""
+        self._accumulated_chunks: List[str] = []
+        self._text_dirty = False
         self._current_tools = {}
-        self.conversation: Optional[List[ChatMessage]] = None
-        self.create_tool_bubble_fn = None
+        self.conversation: Optional[List[dict]] = None
+        # bubble id -> message dict for in-place tool status updates within this turn
+        self._tool_bubbles: Dict[str, dict] = {}
+        # id(message) -> the copy snapshot() last handed out; dropped whenever the message changes
+        self._snapshot_copies: Dict[int, dict] = {}
         self.tracer = tracer
+        self._tracing = bool(tracer)
         self.current_tool_calls = {}
         self._message_map = {}
+        self.pending_chars = 0
+        # Callbacks run on the stream reader thread while the chat generator reads on the event loop;
+        # this guards the conversation, the message map and the tool call state as well as the text buffer
+        self._lock = threading.RLock()
 
     def on_message_delta(self, delta: MessageDeltaChunk) -> None:
-        if delta.id != self._current_message_id:
-            self._current_message_id = delta.id
-            self._accumulated_text = ""
+        # Role/control-only deltas carry no text; skip them before touching any state
+        content = delta.delta.content
+        if not content:
+            return
+        # Single pass: each text fragment goes straight into the chunk list; joining waits for flush_text
+        with self._lock:
+            for chunk in content:
+                text = getattr(chunk, "text", None)
+                value = text.get("value") if text else None
+                if not value:
+                    continue
+                if delta.id != self._current_message_id:
+                    self._start_message(delta.id)
+                self._accumulated_chunks.append(value)
+                self._text_dirty = True
+                self.pending_chars += len(value)
+                if _VERBOSE:
+                    print(value, end="")
+
+    def _start_message(self, message_id: str) -> None:
+        self.flush_text()
+        self._current_message_id = message_id
+        self._accumulated_chunks = []
+        if _VERBOSE:
             print("\nassistant> ", end="")
 
-            if self.conversation is not None:
-                new_msg = ChatMessage(role="assistant", content="")
-                self.conversation.append(new_msg)
-                self._message_map[delta.id] = new_msg
-
-        partial_text = ""
-        for chunk in delta.delta.content or []:
-            if hasattr(chunk, "text") and chunk.text:
-                partial_text += chunk.text.get("value", "")
+        if self.conversation is not None:
+            new_msg = {"role": "assistant", "content": "", "metadata": {}}
+            self.conversation.append(new_msg)
+            self._message_map[message_id] = new_msg
 
-        if partial_text:
-            self._accumulated_text += partial_text
-            print(partial_text, end="", flush=True)
-
-            if self.conversation:
-                target_msg = self._message_map.get(delta.id)
-                if target_msg:
-                    target_msg.content = self._accumulated_text
+    def flush_text(self) -> None:
+        """Join the buffered deltas and write them to the current message's chat entry."""
+        with self._lock:
+            if not self._text_dirty:
+                return
+            self._text_dirty = False
+            text = "".join(self._accumulated_chunks)
+            self._accumulated_chunks = [text]
+
+            target_msg = self._message_map.get(self._current_message_id)
+            if target_msg:
+                target_msg["content"] = text
+                self._snapshot_copies.pop(id(target_msg), None)
+
+    def snapshot(self) -> List[dict]:
+        """Flush buffered text and return a copy of the conversation that the reader thread no longer mutates."""
+        with self._lock:
+            self.flush_text()
+            self.pending_chars = 0
+            # Only messages added or changed since the last snapshot are copied; the rest reuse their earlier copy
+            copies = self._snapshot_copies
+            snapshot = []
+            for msg in self.conversation:
+                copy = copies.get(id(msg))
+                if copy is None:
+                    copy = copies[id(msg)] = {**msg, "metadata": dict(msg.get("metadata") or {})}
+                snapshot.append(copy)
+            return snapshot
+
+    def create_tool_bubble(self, tool_name: str, content: str = "", call_id: str = None, status: str = "pending"):
+        """Add or update the status bubble for a tool call in this turn's conversation."""
+        if tool_name is None or self.conversation is None:
+            return None
+
+        title_prefix = TOOL_TITLES.get(tool_name, f"🛠️ {tool_name}")
+
+        status_icon = TOOL_STATUS_ICONS.get(status, "")
+        title = f"{status_icon} {title_prefix}"
+
+        bubble_id = f"tool-{call_id}" if call_id else "tool-noid"
+
+        msg = self._tool_bubbles.get(bubble_id)
+
+        if msg:
+            if _VERBOSE:
+                print(f"DEBUG: Updating tool bubble {bubble_id}: Status='{status}', Content='{_trunc(content, 50)}'")
+            msg["metadata"]["title"] = title
+            msg["metadata"]["status"] = status
+            msg["content"] = content
+            self._snapshot_copies.pop(id(msg), None)
+        else:
+            if _VERBOSE:
+                print(f"DEBUG: Creating tool bubble {bubble_id}: Status='{status}', Content='{_trunc(content, 50)}'")
+            msg = {"role": "assistant", "content": content, "metadata": {"title": title, "id": bubble_id, "status": status}}
+            self.conversation.append(msg)
+            self._tool_bubbles[bubble_id] = msg
+
+        return msg
 
     def on_thread_message(self, message: ThreadMessage) -> None:
-        print(f"\nDEBUG: on_thread_message - ID: {message.id}, Role: {message.role}, Status: {message.status}")
+        if _VERBOSE:
+            print(f"\nDEBUG: on_thread_message - ID: {message.id}, Role: {message.role}, Status: {message.status}")
         if message.role == "assistant" and message.status == "completed":
             final_content = ""
             if message.content:
@@ -71,17 +257,21 @@ class EventHandler(AgentEventHandler):
                     if hasattr(content_part, "text") and content_part.text:
                         final_content += content_part.text.value
 
-            print(f"\nAssistant message completed (ID: {message.id}): {final_content[:500]}...")
+            if _VERBOSE:
+                print(f"\nAssistant message completed (ID: {message.id}): {_trunc(final_content, 500)}")
 
-            if self.conversation:
-                mapped = self._message_map.get(message.id)
-                if mapped:
-                    mapped.content = final_content
-                elif final_content:
-                    self.conversation.append(ChatMessage(role="assistant", content=final_content))
+            with self._lock:
+                if self.conversation:
+                    mapped = self._message_map.get(message.id)
+                    if mapped:
+                        mapped["content"] = final_content
+                        self._snapshot_copies.pop(id(mapped), None)
+                    elif final_content:
+                        self.conversation.append({"role": "assistant", "content": final_content, "metadata": {}})
 
     def on_thread_run(self, run: ThreadRun) -> None:
-        print(f"\nthread_run status > {run.status} (ID: {run.id})")
+        if _VERBOSE:
+            print(f"\nthread_run status > {run.status} (ID: {run.id})")
 
         if run.status == "failed":
             print(f"❌ ERROR > Run failed with ID: {run.id}")
@@ -94,149 +284,128 @@ class EventHandler(AgentEventHandler):
             if hasattr(run, "required_action") and run.required_action:
                 print(f"⚠️ REQUIRED ACTION > {run.required_action}")
 
-        elif run.status == "completed":
+        elif run.status == "completed" and _VERBOSE:
             print(f"✓ Run completed successfully (ID: {run.id})")
 
-        if self.tracer:
+        if self._tracing:
             try:
                 span = trace.get_current_span()
-                if span and hasattr(span, "is_recording") and span.is_recording():
-                    span.set_attribute("run_id", run.id)
-                    span.set_attribute("run_status", run.status)
+                if _rec(span):
+                    attributes = {"run_id": run.id, "run_status": run.status}
                     if run.status == "failed" and run.last_error:
-                        span.set_attribute("error_code", run.last_error.code)
-                        span.set_attribute("error", run.last_error.message)
+                        attributes["error_code"] = run.last_error.code
+                        attributes["error"] = run.last_error.message
+                    span.set_attributes(attributes)
             except Exception as ex:
                 print(f"WARNING: Failed to record tracing for run: {ex}")
 
     def on_run_step_delta(self, delta: RunStepDeltaChunk) -> None:
         step_delta = delta.delta.step_details
         if step_delta and step_delta.type == "tool_calls":
-            for tcall_delta in step_delta.tool_calls or []:
-                call_id = tcall_delta.id
-                if not call_id:
-                    continue
-
-                if tcall_delta.type == "function" and tcall_delta.function:
-                    func_delta = tcall_delta.function
-                    if call_id not in self.current_tool_calls:
-                        print(f"\nDEBUG: Tool call started: {func_delta.name} (ID: {call_id})")
-                        self.current_tool_calls[call_id] = {"name": func_delta.name, "arguments": "", "status": "starting"}
-                        if self.create_tool_bubble_fn:
-                            self.create_tool_bubble_fn(func_delta.name, "...", call_id, "pending")
-                    if func_delta.arguments:
-                        self.current_tool_calls[call_id]["arguments"] += func_delta.arguments
+            with self._lock:
+                for tcall_delta in step_delta.tool_calls or []:
+                    call_id = tcall_delta.id
+                    if not call_id:
+                        continue
+
+                    if tcall_delta.type == "function" and tcall_delta.function:
+                        func_delta = tcall_delta.function
+                        if call_id not in self.current_tool_calls:
+                            if _VERBOSE:
+                                print(f"\nDEBUG: Tool call started: {func_delta.name} (ID: {call_id})")
+                            self.current_tool_calls[call_id] = {"name": func_delta.name, "arguments": "", "status": "starting"}
+                            self.create_tool_bubble(func_delta.name, "...", call_id, "pending")
+                        if func_delta.arguments:
+                            self.current_tool_calls[call_id]["arguments"] += func_delta.arguments
 
     def on_run_step(self, step: RunStep) -> None:
-        if self.tracer:
-            span = trace.get_current_span()
-            if span and span.is_recording():
-                span.set_attribute(f"step_{step.id}_type", step.type)
-                span.set_attribute(f"step_{step.id}_status", step.status)
+        span = trace.get_current_span() if self._tracing else None
+        rec = _rec(span)
+        if rec and _OTEL_DETAIL:
+            span.set_attributes({f"step_{step.id}_type": step.type, f"step_{step.id}_status": step.status})
 
         if step.type == "tool_calls" and step.step_details and step.step_details.tool_calls:
-            for tcall in step.step_details.tool_calls:
-                call_id = tcall.id
-                tool_info = self.current_tool_calls.get(call_id)
-                func_name = tool_info["name"] if tool_info else "unknown_function"
-                output = None
-
-                if step.status == "completed":
-                    print(f"Tool call completed: {func_name} (ID: {call_id})")
-                    if tcall.type == "function" and hasattr(tcall, "function") and tcall.function.output:
-                        output_str = tcall.function.output
-                        print(f"  Output: {output_str[:200]}{'...' if len(output_str) > 200 else ''}")
-                        try:
-                            output = json.loads(output_str)
-                            if func_name == "get_shelf_layout" and "layout_visual" in output:
-                                message = output["layout_visual"]
-                            elif "message" in output:
-                                message = output["message"]
-                            elif "error" in output:
-                                message = f"Error: {output['error']}"
-                            elif func_name == "check_item_stock" and "stock" in output:
-                                message = f"{output['name']} (ID: {output['item_id']}): {output['stock']} units in stock."
-                            elif func_name == "find_item_location" and "location_id" in output:
-                                message = (
-                                    f"{output['name']} (ID: {output['item_id']}) is located at "
-                                    f"Shelf {output['location_id']}, Position {output['position']}."
-                                )
-                            elif func_name == "get_items_needing_restock" and "count" in output:
-                                count = output["count"]
-                                if count > 0:
-                                    items_str = ", ".join(
-                                        [f"{i['name']} ({i['current_stock']})" for i in output["low_stock_items"][:3]]
-                                    )
-                                    message = (
-                                        f"Found {count} low stock items. Examples: {items_str}{'...' if count > 3 else ''}."
-                                    )
-                                else:
-                                    message = "No items found needing restock."
-                            else:
-                                message = f"Completed. Output: {output_str[:1000]}{'...' if len(output_str) > 100 else ''}"
-
-                        except json.JSONDecodeError:
-                            message = (
-                                f"Completed. Output (non-JSON): {output_str[:1000]}{'...' if len(output_str) > 100 else ''}"
-                            )
-                            print(f"Warning: Could not parse JSON output for {func_name}: {output_str}")
-
-                    elif tcall.type == "bing_grounding":
-                        message = "Finished searching web sources."
-                    else:
-                        message = "Tool call finished."
-
-                    if self.create_tool_bubble_fn:
-                        self.create_tool_bubble_fn(func_name, message, call_id, "done")
-
-                elif step.status == "failed":
-                    error_message = f"Tool call failed: {func_name} (ID: {call_id})"
-                    if step.last_error:
-                        error_message += f" - Error: {step.last_error.message}"
-                    print(error_message)
-                    if self.tracer and span and span.is_recording():
-                        span.set_attribute(f"step_{step.id}_error", error_message)
-                    if self.create_tool_bubble_fn:
-                        self.create_tool_bubble_fn(func_name, error_message, call_id, "error")
-
-                if call_id in self.current_tool_calls:
-                    del self.current_tool_calls[call_id]
-
-
-def convert_dict_to_chatmessage(msg: dict) -> ChatMessage:
-    return ChatMessage(role=msg["role"], content=msg["content"], metadata=msg.get("metadata"))
-
-
-def convert_chatmessage_to_dict(msg: ChatMessage) -> dict:
-    return {"role": msg.role, "content": msg.content, "metadata": msg.metadata if msg.metadata else {}}
+            with self._lock:
+                for tcall in step.step_details.tool_calls:
+                    call_id = tcall.id
+                    tool_info = self.current_tool_calls.pop(call_id, None)
+                    func_name = tool_info["name"] if tool_info else "unknown_function"
+                    output = None
+
+                    if step.status == "completed":
+                        if _VERBOSE:
+                            print(f"Tool call completed: {func_name} (ID: {call_id})")
+                        if tcall.type == "function" and hasattr(tcall, "function") and tcall.function.output:
+                            output_str = tcall.function.output
+                            if _VERBOSE:
+                                print(f"  Output: {_trunc(output_str, 200)}")
+                            try:
+                                output = _json.loads(output_str)
+                                formatter = TOOL_FORMATTERS.get(func_name)
+                                message = formatter(output) if formatter and isinstance(output, dict) else None
+                                if message is None:
+                                    message = format_generic_output(output, output_str)
+
+                            except _json.JSONDecodeError:
+                                message = f"Completed. Output (non-JSON): {_trunc(output_str, 1000)}"
+                                print(f"Warning: Could not parse JSON output for {func_name}: {_trunc(output_str, 200)}")
+
+                        elif tcall.type == "bing_grounding":
+                            message = "Finished searching web sources."
+                        else:
+                            message = "Tool call finished."
+
+                        self.create_tool_bubble(func_name, message, call_id, "done")
+
+                    elif step.status == "failed":
+                        error_message = f"Tool call failed: {func_name} (ID: {call_id})"
+                        if step.last_error:
+                            error_message += f" - Error: {step.last_error.message}"
+                        print(error_message)
+                        if rec:
+                            span.set_attribute(f"step_{step.id}_error", error_message)
+                        self.create_tool_bubble(func_name, error_message, call_id, "error")
+
+
+class ChatInterface:
+    """Gradio chat handler bound to one agent; assign ``thread`` to start a fresh conversation."""
+
+    def __init__(self, project_client, agent, thread, tracer=None):
+        self.project_client = project_client
+        self.agent = agent
+        self.tracer = tracer
+        self._last_message_sent_time = 0
+        self.thread = thread
 
+    @property
+    def thread(self):
+        return self._thread
 
-def create_chat_interface(project_client, agent, thread, tracer=None):
-    last_message_sent_time = 0
-    conversation_state: List[ChatMessage] = []
+    @thread.setter
+    def thread(self, thread):
+        self._thread = thread
+        self._conversation_state: List[dict] = []
 
-    def create_span(name, parent_span=None):
-        if not tracer:
+    def create_span(self, name, parent_span=None):
+        if not self.tracer:
             return nullcontext()
 
         try:
             if parent_span:
-                return tracer.start_as_current_span(name, parent=parent_span)
+                return self.tracer.start_as_current_span(name, parent=parent_span)
             else:
-                return tracer.start_as_current_span(name)
+                return self.tracer.start_as_current_span(name)
         except TypeError:
             print("DEBUG: Tracer doesn't support parent parameter, using simpler span creation")
-            return tracer.start_as_current_span(name)
+            return self.tracer.start_as_current_span(name)
         except Exception as e:
             print(f"WARNING: Could not create span: {e}")
             return nullcontext()
 
-    def azure_store_chat(user_message: str, history: List[dict]):
-        nonlocal last_message_sent_time
-        nonlocal conversation_state
+    async def __call__(self, user_message: str, history: List[dict]):
         current_time = time.time()
 
-        if current_time - last_message_sent_time < 2:
+        if current_time - self._last_message_sent_time < 2:
             print("WARN: Duplicate message submission detected, skipping.")
             yield history, ""
             return
@@ -246,145 +415,134 @@ def create_chat_interface(project_client, agent, thread, tracer=None):
             yield history, ""
             return
 
-        last_message_sent_time = current_time
+        self._last_message_sent_time = current_time
+        # Pin the thread for this turn; clear_history may swap it while the stream is running
+        thread = self.thread
 
         if history:
-            conversation_state = [convert_dict_to_chatmessage(m) for m in history]
-        conversation: List[ChatMessage] = conversation_state
+            self._conversation_state = list(history)
+        conversation: List[dict] = self._conversation_state
 
         print(f"\nUser message: {user_message}")
-        conversation.append(ChatMessage(role="user", content=user_message))
-        yield [convert_chatmessage_to_dict(m) for m in conversation], ""
-
-        chat_span = None
-        if tracer:
-            chat_span = tracer.start_span("store_chat_interaction")
-            if chat_span and hasattr(chat_span, "is_recording") and chat_span.is_recording():
-                chat_span.set_attribute("user_message", user_message)
-                chat_span.set_attribute("thread_id", thread.id)
-                chat_span.set_attribute("agent_id", agent.id)
-                chat_span.set_attribute("conversation_length_start", len(conversation))
+        conversation.append({"role": "user", "content": user_message, "metadata": {}})
+        yield conversation, ""
+
+        chat_span = self.tracer.start_span("store_chat_interaction") if self.tracer else None
+        chat_rec = _rec(chat_span)
+        if chat_rec:
+            chat_span.set_attributes(
+                {
+                    "user_message": user_message,
+                    "thread_id": thread.id,
+                    "agent_id": self.agent.id,
+                    "conversation_length_start": len(conversation),
+                }
+            )
 
         try:
             try:
-                project_client.agents.create_message(thread_id=thread.id, role="user", content=user_message)
+                await asyncio.to_thread(
+                    self.project_client.agents.create_message, thread_id=thread.id, role="user", content=user_message
+                )
                 print(f"Message sent to thread {thread.id}")
             except Exception as msg_ex:
                 print(f"❌ ERROR sending message: {msg_ex}")
-                error_msg = ChatMessage(role="assistant", content=f"Error sending message: {str(msg_ex)}")
-                conversation.append(error_msg)
-                yield [convert_chatmessage_to_dict(m) for m in conversation], ""
+                conversation.append({"role": "assistant", "content": f"Error sending message: {str(msg_ex)}", "metadata": {}})
+                yield conversation, ""
                 return
 
-            tool_titles = {
-                "bing_grounding": "🔎 Searching Web Sources",
-                "generate_location_map": "🗺️ Generating Map",
-                "get_clients_for_today": "📅 Today's Clients",
-                "unknown_function": "🔍 Searching Web",
-            }
-
-            tool_icons_status = {"pending": "⏳", "done": "✅", "error": "❌"}
-
-            def create_tool_bubble(tool_name: str, content: str = "", call_id: str = None, status: str = "pending"):
-                if tool_name is None:
-                    return
-
-                title_prefix = tool_titles.get(tool_name, f"🛠️ {tool_name}")
-
-                status_icon = tool_icons_status.get(status, "")
-                title = f"{status_icon} {title_prefix}"
-
-                bubble_id = f"tool-{call_id}" if call_id else "tool-noid"
-
-                existing_bubble = None
-                for msg in reversed(conversation):
-                    if msg.metadata and msg.metadata.get("id") == bubble_id:
-                        existing_bubble = msg
-                        break
-
-                if existing_bubble:
-                    print(f"DEBUG: Updating tool bubble {bubble_id}: Status='{status}', Content='{content[:50]}...'")
-                    existing_bubble.metadata["title"] = title
-                    existing_bubble.metadata["status"] = status
-                    existing_bubble.content = content
-                else:
-                    print(f"DEBUG: Creating tool bubble {bubble_id}: Status='{status}', Content='{content[:50]}...'")
-                    msg = ChatMessage(
-                        role="assistant", content=content, metadata={"title": title, "id": bubble_id, "status": status}
-                    )
-                    conversation.append(msg)
-
-                return msg
-
-            event_handler = EventHandler(tracer)
+            # A fresh handler per turn; another session's turn may still be streaming through its own
+            event_handler = EventHandler(self.tracer)
             event_handler.conversation = conversation
-            event_handler.create_tool_bubble_fn = create_tool_bubble
 
             print(f"Starting agent stream for thread {thread.id}...")
             try:
-                with project_client.agents.create_stream(
+                stream = await asyncio.to_thread(
+                    self.project_client.agents.create_stream,
                     thread_id=thread.id,
-                    assistant_id=agent.id,
+                    assistant_id=self.agent.id,
                     event_handler=event_handler,
-                ) as stream:
-                    for item in stream:
-                        try:
-                            event_type, event_data, *_ = item
-
-                            if event_type == "thread.run.step.delta":
-                                pass
-
-                            elif event_type == "run_step":
-                                pass
-
-                            elif event_type == "thread.message.delta":
-                                pass
-
-                            elif event_type == "thread_run":
-                                status = event_data.get("status")
-                                print(f"\nthread_run status > {status} (ID: {event_data.get('id')})")
-
-                                if status == "requires_action":
-                                    print("⚠️ NOTE: Run requires action - this is normal for tool calls")
-                                elif status == "failed":
-                                    print(f"❌ ERROR > Run failed with ID: {event_data.get('id')}")
-                                    if "last_error" in event_data and event_data["last_error"]:
-                                        print(f"❌ ERROR DETAILS > {event_data['last_error']}")
-
-                            yield [convert_chatmessage_to_dict(m) for m in conversation], ""
-
-                        except Exception as stream_item_ex:
-                            print(f"❌ ERROR processing stream item: {stream_item_ex}")
-                            continue
+                )
+                # A reader thread owns the socket reads; this generator only wakes when an event is queued.
+                # Tool functions run on that thread, so it runs in this turn's context like asyncio.to_thread would.
+                events: asyncio.Queue = asyncio.Queue()
+                stop = threading.Event()
+                reader = threading.Thread(
+                    target=copy_context().run,
+                    args=(_drain_stream, stream, asyncio.get_running_loop(), events, stop),
+                    daemon=True,
+                )
+                with stream:
+                    reader.start()
+                    try:
+                        last_yield = time.monotonic()
+                        while True:
+                            item = await events.get()
+                            if item is _STREAM_END:
+                                break
+                            if isinstance(item, Exception):
+                                raise item
+                            try:
+                                # Deltas and run steps are handled by the EventHandler; only run status is logged here
+                                event_type = item[0]
+                                if event_type == "thread_run":
+                                    event_data = item[1]
+                                    status = event_data.get("status")
+                                    print(f"\nthread_run status > {status} (ID: {event_data.get('id')})")
+
+                                    if status == "requires_action":
+                                        print("⚠️ NOTE: Run requires action - this is normal for tool calls")
+                                    elif status == "failed":
+                                        print(f"❌ ERROR > Run failed with ID: {event_data.get('id')}")
+                                        if "last_error" in event_data and event_data["last_error"]:
+                                            print(f"❌ ERROR DETAILS > {event_data['last_error']}")
+
+                                now = time.monotonic()
+                                if (
+                                    event_type in FLUSH_EVENT_TYPES
+                                    or event_handler.pending_chars > YIELD_MAX_PENDING_CHARS
+                                    or now - last_yield > YIELD_INTERVAL_SECONDS
+                                ):
+                                    last_yield = now
+                                    yield event_handler.snapshot(), ""
+
+                            except Exception as stream_item_ex:
+                                print(f"❌ ERROR processing stream item: {stream_item_ex}")
+                                continue
+                    finally:
+                        stop.set()
 
                 print("Agent stream finished successfully.")
             except Exception as stream_ex:
                 print(f"❌ ERROR in stream: {stream_ex}")
-                error_msg = ChatMessage(
-                    role="assistant", content=f"An error occurred while processing your request: {str(stream_ex)}"
-                )
+                error_msg = {
+                    "role": "assistant",
+                    "content": f"An error occurred while processing your request: {str(stream_ex)}",
+                    "metadata": {},
+                }
                 conversation.append(error_msg)
 
-            yield [convert_chatmessage_to_dict(m) for m in conversation], ""
+            yield event_handler.snapshot(), ""
 
         except Exception as e:
             print(f"❌ CRITICAL ERROR in chat execution: {e}")
-            error_msg = ChatMessage(
-                role="assistant",
-                content=f"An error occurred: {str(e)}. Please try again or contact support if the issue persists.",
-            )
+            error_msg = {
+                "role": "assistant",
+                "content": f"An error occurred: {str(e)}. Please try again or contact support if the issue persists.",
+                "metadata": {},
+            }
             conversation.append(error_msg)
-            if chat_span and hasattr(chat_span, "is_recording") and chat_span.is_recording():
+            if chat_rec:
                 try:
                     chat_span.record_exception(e)
                     chat_span.set_status(trace.Status(trace.StatusCode.ERROR, description=str(e)))
                 except Exception as trace_ex:
                     print(f"WARNING: Error recording exception in span: {trace_ex}")
-            yield [convert_chatmessage_to_dict(m) for m in conversation], ""
+            yield conversation, ""
 
         finally:
             if chat_span and hasattr(chat_span, "end"):
-                if hasattr(chat_span, "is_recording") and chat_span.is_recording():
+                if chat_rec:
                     chat_span.set_attribute("conversation_length_end", len(conversation))
                     if (
                         hasattr(chat_span, "status")
@@ -395,4 +553,6 @@ def create_chat_interface(project_client, agent, thread, tracer=None):
                 chat_span.end()
                 print("Chat interaction span ended.")
 
-    return azure_store_chat
+
+def create_chat_interface(project_client, agent, thread, tracer=None):
+    return ChatInterface(project_client, agent, thread, tracer)
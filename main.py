@@ -1,73 +1,101 @@
-import json
-import os
-
-import gradio as gr
-import plotly.graph_objects as go
-from azure.ai.projects import AIProjectClient
-from azure.ai.projects.models import BingGroundingTool, FunctionTool, ToolSet
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
-from opentelemetry import trace
-
-from chat_ui import create_chat_interface
-from sales_functions import (
-    generate_location_map,
-    get_clients_for_today,
-    get_current_visit_status,
-    get_next_visit,
-    plan_optimal_route,
-    reset_sales_day,
-)
-
-load_dotenv(override=True)
-
-tracer = trace.get_tracer(__name__)
-
-credential = DefaultAzureCredential()
-project_client = AIProjectClient.from_connection_string(
-    credential=credential, conn_str=os.environ["PROJECT_CONNECTION_STRING"]
-)
-
-bing_tool = None
-bing_connection_name = os.environ.get("BING_CONNECTION_NAME")
-if bing_connection_name:
-    try:
-        with tracer.start_as_current_span("setup_bing_tool") as span:
-            span.set_attribute("bing_connection_name", bing_connection_name)
-            bing_connection = project_client.connections.get(connection_name=bing_connection_name)
-            conn_id = bing_connection.id
-            bing_tool = BingGroundingTool(connection_id=conn_id)
-            print("bing > connected")
-    except Exception as ex:
-        print(f"bing > not connected: {ex}")
-
-AGENT_NAME = "sales-planning-agent"
-
-with tracer.start_as_current_span("setup_agent") as span:
-    span.set_attribute("agent_name", AGENT_NAME)
-    span.set_attribute("model", os.environ.get("MODEL_DEPLOYMENT_NAME", "gpt-4o"))
-
-    found_agent = next((a for a in project_client.agents.list_agents().data if a.name == AGENT_NAME), None)
-
-    toolset = ToolSet()
-
-    if bing_tool:
-        toolset.add(bing_tool)
-
-    toolset.add(
-        FunctionTool(
-            {
-                get_clients_for_today,
-                plan_optimal_route,
-                get_next_visit,
-                get_current_visit_status,
-                generate_location_map,
-                reset_sales_day,
-            }
-        )
-    )
-
-    instructions = """
+import asyncio
+import functools
+import os
+import threading
+import types
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Final
+
+import gradio as gr
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from azure.ai.projects import AIProjectClient
+from azure.ai.projects.models import BingGroundingTool, FunctionTool, ToolSet
+from azure.core.exceptions import ResourceNotFoundError
+from azure.identity import DefaultAzureCredential
+from dotenv import load_dotenv
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+
+from chat_ui import create_chat_interface
+from sales_functions import (
+    ROUTE_DUMP_PATH,
+    SalesDayState,
+    generate_location_map,
+    get_clients_for_today,
+    get_current_visit_status,
+    get_next_visit,
+    plan_optimal_route,
+    reset_sales_day,
+    sales_day,
+)
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+else:
+    # Route figures carry thousands of coordinates; let Plotly serialize them with orjson too
+    pio.json.config.default_engine = "orjson"
+
+load_dotenv(override=True)
+
+CFG = types.SimpleNamespace(
+    model=os.environ.get("MODEL_DEPLOYMENT_NAME", "gpt-4o"),
+    maps_key=os.environ.get("AZURE_MAPS_KEY"),
+    project_conn_str=os.environ.get("PROJECT_CONNECTION_STRING"),
+    bing=os.environ.get("BING_CONNECTION_NAME"),
+    server=os.environ.get("GRADIO_SERVER_NAME", "0.0.0.0"),
+    port=int(os.environ.get("GRADIO_SERVER_PORT", "7860")),
+)
+
+
+def configure_tracing():
+    """Install a head-sampled, batching tracer provider when a trace exporter is configured."""
+    if os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING"):
+        from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+
+        exporter = AzureMonitorTraceExporter()
+    elif os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("tracing > OTEL_EXPORTER_OTLP_ENDPOINT set but opentelemetry-exporter-otlp is not installed")
+            return
+        exporter = OTLPSpanExporter()
+    else:
+        # Without an exporter the default no-op provider is the cheapest option
+        return
+
+    provider = TracerProvider(sampler=ParentBasedTraceIdRatio(float(os.environ.get("OTEL_SAMPLE", "0.1"))))
+    provider.add_span_processor(BatchSpanProcessor(exporter, max_queue_size=2048, schedule_delay_millis=5000))
+    trace.set_tracer_provider(provider)
+
+
+configure_tracing()
+tracer = trace.get_tracer(__name__)
+
+credential = DefaultAzureCredential()
+project_client = AIProjectClient.from_connection_string(credential=credential, conn_str=CFG.project_conn_str)
+
+AGENT_NAME = "sales-planning-agent"
+AGENT_ID_FILE = Path(".sales_agent_id")
+# Ordered so the tool definitions sent to the service are identical on every start
+AGENT_FUNCTIONS = (
+    get_clients_for_today,
+    plan_optimal_route,
+    get_next_visit,
+    get_current_visit_status,
+    generate_location_map,
+    reset_sales_day,
+)
+
+AGENT_INSTRUCTIONS: Final[str] = """
     You are a helpful Sales Planning Assistant designed to help sales professionals plan and execute their daily client visits.
     Follow these rules:
 
@@ -101,190 +129,363 @@ with tracer.start_as_current_span("setup_agent") as span:
        what the user is seeing.
 
     Always ask if the user needs any more information about their sales route or client visits.
-    """
-
-    agent_model = os.environ.get("MODEL_DEPLOYMENT_NAME", "gpt-4o")
-
-    if found_agent:
-        span.set_attribute("agent_action", "update")
-        agent = project_client.agents.update_agent(
-            assistant_id=found_agent.id, model=agent_model, name=AGENT_NAME, instructions=instructions, toolset=toolset
-        )
-    else:
-        span.set_attribute("agent_action", "create")
-        agent = project_client.agents.create_agent(
-            model=agent_model, name=AGENT_NAME, instructions=instructions, toolset=toolset
-        )
-    print(f"Agent '{agent.name}' (ID: {agent.id}) is ready using model '{agent.model}'.")
-
-with tracer.start_as_current_span("create_thread") as span:
-    thread = project_client.agents.create_thread()
-    span.set_attribute("thread_id", thread.id)
-    print(f"Created new thread: {thread.id}")
-
-azure_sales_chat = create_chat_interface(project_client, agent, thread, tracer)
-
-
-def process_route_data(route_file="/workspaces/appmag/route_response.json"):
-    try:
-        with open(route_file, "r") as f:
-            data = json.load(f)
-
-        if not data.get("routes"):
-            return None, []
-
-        route = data["routes"][0]
-        coordinates = []
-        instructions = []
-
-        for instruction in route["guidance"]["instructions"]:
-            if "point" in instruction:
-                instructions.append(
-                    {
-                        "type": instruction["instructionType"],
-                        "street": instruction.get("street", ""),
-                        "message": instruction.get("message", ""),
-                        "lat": instruction["point"]["latitude"],
-                        "lon": instruction["point"]["longitude"],
-                    }
-                )
-                coordinates.append([instruction["point"]["latitude"], instruction["point"]["longitude"]])
-
-        fig = go.Figure()
-
-        # Add route line
-        lat_list = [point[0] for point in coordinates]
-        lon_list = [point[1] for point in coordinates]
-
-        fig.add_trace(
-            go.Scattermapbox(
-                lat=lat_list, lon=lon_list, mode="lines", line=dict(width=2, color="blue"), name="Route", showlegend=False
-            )
-        )
-
-        marker_props = {
-            "LOCATION_DEPARTURE": {"color": "green", "size": 15},
-            "LOCATION_WAYPOINT": {"color": "blue", "size": 15},
-            "LOCATION_ARRIVAL": {"color": "red", "size": 15},
-            "TURN": {"color": "orange", "size": 8},
-        }
-
-        for instr in instructions:
-            props = marker_props.get(instr["type"], {"color": "gray", "size": 6})
-
-            hover_text = f"Type: {instr['type']}<br>" f"Street: {instr['street']}<br>" f"Action: {instr['message']}"
-
-            fig.add_trace(
-                go.Scattermapbox(
-                    lat=[instr["lat"]],
-                    lon=[instr["lon"]],
-                    mode="markers",
-                    marker=dict(size=props["size"], color=props["color"]),
-                    text=[hover_text],
-                    name=instr["type"],
-                    showlegend=False,
-                    hoverinfo="text",
-                )
-            )
-
-        # Center map on Switzerland
-        fig.update_layout(
-            mapbox=dict(style="open-street-map", center=dict(lat=46.8, lon=8.2), zoom=7),
-            margin=dict(l=0, r=0, t=0, b=0),
-            height=600,
-            showlegend=False,  # Add this line to disable legend completely
-        )
-
-        # Extract navigation sections
-        nav_sections = []
-        for group in route["guidance"]["instructionGroups"]:
-            nav_sections.append([f"Section {len(nav_sections) + 1}", group["groupMessage"]])
-
-        return fig, nav_sections
-    except Exception as e:
-        print(f"Error processing route data: {e}")
-        return None, []
-
-
-with gr.Blocks(
-    title="Sales Planning Assistant",
-    fill_height=True,
-    css="""
-            .chat-area { height:65vh !important; overflow:auto; }
-            .input-area { position:sticky; bottom:0; }
-            .route-section { border-top: 2px solid #eee; padding-top: 20px; margin-top: 20px; }
-        """,
-) as demo:
-    gr.Markdown("## Sales Planning Assistant")
-    gr.Markdown("*Plan your sales day and navigate client visits with AI assistance*")
-
-    with gr.Row():
-        with gr.Column(scale=2):
-            chatbot = gr.Chatbot(type="messages", label="Chat History", elem_classes="chat-area", layout="panel")
-            input_box = gr.Textbox(label="Ask the assistant …", elem_classes="input-area")
-        with gr.Column(scale=1, elem_classes="route-section"):
-            gr.Markdown("### Route Visualization")
-            view_route_btn = gr.Button("Visualize Last Route")
-            route_map = gr.Plot(label="Route Map")
-            route_accordion = gr.Accordion("Navigation Instructions", open=False)
-            with route_accordion:
-                navigation = gr.Dataframe(
-                    headers=["Section", "Instructions"], datatype=["str", "str"], label="Route Instructions"
-                )
-
-    def clear_history():
-        with tracer.start_as_current_span("clear_chat_history") as span:
-            global thread, azure_sales_chat
-            print(f"Clearing history. Old thread: {thread.id}")
-            thread = project_client.agents.create_thread()
-            azure_sales_chat = create_chat_interface(project_client, agent, thread, tracer)
-            span.set_attribute("new_thread_id", thread.id)
-            print(f"New thread: {thread.id}")
-            return []
-
-    with gr.Row():
-        clear_button = gr.Button("Clear Chat History")
-
-    gr.Markdown("### Example Questions")
-    with gr.Row():
-        q1 = gr.Button("Who are my clients today?")
-        q2 = gr.Button("Plan my optimal rout (including detailed directions for each leg)?")
-        q4 = gr.Button("Show me a map of my next location")
-    clear_button.click(fn=clear_history, outputs=chatbot).then(lambda: "", outputs=input_box)
-
-    def set_example_question(question):
-        with tracer.start_as_current_span("select_example_question") as span:
-            span.set_attribute("example_question", question)
-            return question
-
-    example_buttons = [q1, q2, q4]
-    for btn in example_buttons:
-        btn.click(lambda x=btn.value: set_example_question(x), inputs=[], outputs=input_box).then(
-            lambda: [], outputs=chatbot
-        ).then(azure_sales_chat, inputs=[input_box, chatbot], outputs=[chatbot, input_box], show_progress="full").then(
-            lambda: "", outputs=input_box
-        )
-
-    input_box.submit(azure_sales_chat, inputs=[input_box, chatbot], outputs=[chatbot, input_box], show_progress="full").then(
-        lambda: "", outputs=input_box
-    )
-
-    def visualize_route():
-        fig, nav_sections = process_route_data()
-        if fig:
-            return fig, nav_sections
-        return None, []
-
-    view_route_btn.click(visualize_route, outputs=[route_map, navigation])
-
-if __name__ == "__main__":
-    if not os.environ.get("AZURE_MAPS_KEY"):
-        print("\n⚠️ WARNING: AZURE_MAPS_KEY environment variable not found!")
-        print("This application requires an Azure Maps API key to function properly.")
-        print("You can set it by running:")
-        print("export AZURE_MAPS_KEY=your_key_here\n")
-
-    server_name = os.environ.get("GRADIO_SERVER_NAME", "0.0.0.0")
-    server_port = int(os.environ.get("GRADIO_SERVER_PORT", 7860))
-
-    demo.queue().launch(server_name=server_name, server_port=server_port, share=False, debug=True, show_error=True)
+    """
+
+
+def _connect_bing():
+    if not CFG.bing:
+        return None
+    try:
+        with tracer.start_as_current_span("setup_bing_tool") as span:
+            span.set_attribute("bing_connection_name", CFG.bing)
+            bing_connection = project_client.connections.get(connection_name=CFG.bing)
+            print("bing > connected")
+            return BingGroundingTool(connection_id=bing_connection.id)
+    except Exception as ex:
+        print(f"bing > not connected: {ex}")
+        return None
+
+
+def _find_agent():
+    # The id remembered from the last start avoids listing every agent in the project
+    try:
+        agent_id = AGENT_ID_FILE.read_text().strip()
+    except OSError:
+        agent_id = ""
+    if agent_id:
+        try:
+            agent = project_client.agents.get_agent(agent_id)
+            if agent.name == AGENT_NAME:
+                return agent
+        except ResourceNotFoundError:
+            print(f"agent > cached id {agent_id} no longer exists, searching by name")
+    return next((a for a in project_client.agents.list_agents().data if a.name == AGENT_NAME), None)
+
+
+def _remember_agent(agent_id):
+    try:
+        AGENT_ID_FILE.write_text(agent_id)
+    except OSError as ex:
+        print(f"agent > could not cache agent id: {ex}")
+
+
+def _create_thread():
+    with tracer.start_as_current_span("create_thread") as span:
+        thread = project_client.agents.create_thread()
+        span.set_attribute("thread_id", thread.id)
+        print(f"Created new thread: {thread.id}")
+        return thread
+
+
+def _agent_matches(found_agent, model, toolset):
+    """Return True when the remote agent already has this model, instructions and tools."""
+    # Compare against the definition the service returned from get_agent/list_agents
+    if getattr(found_agent, "model", None) != model or getattr(found_agent, "instructions", None) != AGENT_INSTRUCTIONS:
+        return False
+    # The service does not promise to return tools in the order they were sent
+    remote_tools = list(getattr(found_agent, "tools", None) or [])
+    local_tools = toolset.definitions
+    return len(remote_tools) == len(local_tools) and all(tool in remote_tools for tool in local_tools)
+
+
+@functools.lru_cache(maxsize=1)
+def _bootstrap():
+    """Create or update the agent and open the first thread; runs once, on the first chat request."""
+    # The Bing connection, agent lookup and first thread are independent round-trips
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        bing_future = pool.submit(_connect_bing)
+        agent_future = pool.submit(_find_agent)
+        thread_future = pool.submit(_create_thread)
+        bing_tool = bing_future.result()
+        found_agent = agent_future.result()
+        first_thread = thread_future.result()
+
+    with tracer.start_as_current_span("setup_agent") as span:
+        span.set_attribute("agent_name", AGENT_NAME)
+        span.set_attribute("model", CFG.model)
+
+        toolset = ToolSet()
+
+        if bing_tool:
+            toolset.add(bing_tool)
+
+        toolset.add(FunctionTool(AGENT_FUNCTIONS))
+
+        agent_model = CFG.model
+
+        if found_agent and _agent_matches(found_agent, agent_model, toolset):
+            span.set_attribute("agent_action", "reuse")
+            print(f"agent > remote configuration unchanged, registering toolset for {found_agent.id}")
+            # Streamed runs only execute function tools the SDK saw through create/update_agent, and it has
+            # no public way to register a toolset otherwise; send just the tools, leaving the rest untouched
+            agent = project_client.agents.update_agent(assistant_id=found_agent.id, toolset=toolset)
+        elif found_agent:
+            span.set_attribute("agent_action", "update")
+            agent = project_client.agents.update_agent(
+                assistant_id=found_agent.id,
+                model=agent_model,
+                name=AGENT_NAME,
+                instructions=AGENT_INSTRUCTIONS,
+                toolset=toolset,
+            )
+        else:
+            span.set_attribute("agent_action", "create")
+            agent = project_client.agents.create_agent(
+                model=agent_model, name=AGENT_NAME, instructions=AGENT_INSTRUCTIONS, toolset=toolset
+            )
+        _remember_agent(agent.id)
+        print(f"Agent '{agent.name}' (ID: {agent.id}) is ready using model '{agent.model}'.")
+
+    _replenish_spare_threads()
+    return agent, first_thread
+
+
+# Pre-created threads so clearing the chat does not wait on a create_thread round-trip
+SPARE_THREAD_COUNT = 2
+_spare_threads = deque()
+# A single worker serializes refills, so the pool never overshoots its target
+_spare_thread_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spare-thread")
+
+
+def _create_spare_thread():
+    if len(_spare_threads) >= SPARE_THREAD_COUNT:
+        return
+    try:
+        _spare_threads.append(project_client.agents.create_thread())
+    except Exception as ex:
+        print(f"thread pool > could not pre-create thread: {ex}")
+
+
+def _replenish_spare_threads():
+    for _ in range(SPARE_THREAD_COUNT - len(_spare_threads)):
+        _spare_thread_executor.submit(_create_spare_thread)
+
+
+def _take_spare_thread():
+    try:
+        return _spare_threads.popleft()
+    except IndexError:
+        return None
+    finally:
+        _replenish_spare_threads()
+
+
+_chat = None
+_chat_lock = threading.Lock()
+_APP_SALES_DAY = SalesDayState()
+
+
+def _current_chat():
+    global _chat
+    with _chat_lock:
+        if _chat is None:
+            agent, first_thread = _bootstrap()
+            _chat = create_chat_interface(project_client, agent, first_thread, tracer)
+        return _chat
+
+
+async def azure_sales_chat(user_message, history):
+    # The agent RPCs happen on the first request instead of delaying server start-up
+    chat = await asyncio.to_thread(_current_chat)
+    # One rep uses this app, so every turn and its tool calls work on the same sales day
+    sales_day.set(_APP_SALES_DAY)
+    async for output in chat(user_message, history):
+        yield output
+
+
+ROUTE_MARKERS = {
+    "LOCATION_DEPARTURE": go.scattermap.Marker(color="green", size=15),
+    "LOCATION_WAYPOINT": go.scattermap.Marker(color="blue", size=15),
+    "LOCATION_ARRIVAL": go.scattermap.Marker(color="red", size=15),
+    "TURN": go.scattermap.Marker(color="orange", size=8),
+}
+DEFAULT_ROUTE_MARKER = go.scattermap.Marker(color="gray", size=6)
+ROUTE_HOVER_TEMPLATE = "Street: %{customdata[0]}<br>Action: %{customdata[1]}<extra></extra>"
+
+# (path, mtime_ns, size) -> (fig, nav_sections); only the last few route files are kept
+_ROUTE_CACHE = {}
+_ROUTE_CACHE_SIZE = 4
+
+
+def process_route_data(route_file=ROUTE_DUMP_PATH):
+    route_file = os.fspath(route_file)
+    try:
+        st = os.stat(route_file)
+    except FileNotFoundError:
+        # No route has been planned yet
+        return None, []
+    except OSError as e:
+        print(f"Error processing route data: {e}")
+        return None, []
+
+    key = (route_file, st.st_mtime_ns, st.st_size)
+    cached = _ROUTE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    result = _build_route_figure(route_file)
+    if result[0] is not None:
+        _ROUTE_CACHE[key] = result
+        while len(_ROUTE_CACHE) > _ROUTE_CACHE_SIZE:
+            del _ROUTE_CACHE[next(iter(_ROUTE_CACHE))]
+    return result
+
+
+def _build_route_figure(route_file):
+    try:
+        # One bulk read; both orjson and the stdlib parser accept bytes
+        with open(route_file, "rb") as f:
+            data = _json.loads(f.read())
+
+        if not data.get("routes"):
+            return None, []
+
+        route = data["routes"][0]
+        points = [instruction for instruction in route["guidance"]["instructions"] if "point" in instruction]
+        n = len(points)
+        coordinates = np.empty((n, 2), dtype=np.float64)
+        instr_types = np.empty(n, dtype=object)
+        # Columns: street, message; passed to Plotly as customdata
+        details = np.empty((n, 2), dtype=object)
+
+        for k, instruction in enumerate(points):
+            coordinates[k, 0] = instruction["point"]["latitude"]
+            coordinates[k, 1] = instruction["point"]["longitude"]
+            instr_types[k] = instruction["instructionType"]
+            details[k, 0] = instruction.get("street", "")
+            details[k, 1] = instruction.get("message", "")
+
+        fig = go.Figure()
+
+        # Add route line
+        fig.add_trace(
+            go.Scattermap(
+                lat=coordinates[:, 0],
+                lon=coordinates[:, 1],
+                mode="lines",
+                line=dict(width=2, color="blue"),
+                name="Route",
+                showlegend=False,
+            )
+        )
+
+        # One marker trace per instruction type rather than one per instruction
+        for instr_type in dict.fromkeys(instr_types):
+            mask = instr_types == instr_type
+            fig.add_trace(
+                go.Scattermap(
+                    lat=coordinates[mask, 0],
+                    lon=coordinates[mask, 1],
+                    mode="markers",
+                    marker=ROUTE_MARKERS.get(instr_type, DEFAULT_ROUTE_MARKER),
+                    customdata=details[mask],
+                    # Hover text is assembled in the browser from customdata
+                    hovertemplate=f"Type: {instr_type}<br>" + ROUTE_HOVER_TEMPLATE,
+                    name=instr_type,
+                    showlegend=False,
+                )
+            )
+
+        # Center map on Switzerland
+        fig.update_layout(
+            map=dict(style="open-street-map", center=dict(lat=46.8, lon=8.2), zoom=7),
+            margin=dict(l=0, r=0, t=0, b=0),
+            height=600,
+            showlegend=False,  # Add this line to disable legend completely
+        )
+
+        # Extract navigation sections
+        nav_sections = []
+        for group in route["guidance"]["instructionGroups"]:
+            nav_sections.append([f"Section {len(nav_sections) + 1}", group["groupMessage"]])
+
+        return fig, nav_sections
+    except (OSError, _json.JSONDecodeError, KeyError) as e:
+        print(f"Error processing route data: {e}")
+        return None, []
+
+
+def build_app():
+    """Build the Gradio UI; nothing is launched until the caller does so."""
+    with gr.Blocks(
+        title="Sales Planning Assistant",
+        fill_height=True,
+        css="""
+                .chat-area { height:65vh !important; overflow:auto; }
+                .input-area { position:sticky; bottom:0; }
+                .route-section { border-top: 2px solid #eee; padding-top: 20px; margin-top: 20px; }
+            """,
+    ) as demo:
+        gr.Markdown("## Sales Planning Assistant")
+        gr.Markdown("*Plan your sales day and navigate client visits with AI assistance*")
+
+        with gr.Row():
+            with gr.Column(scale=2):
+                chatbot = gr.Chatbot(type="messages", label="Chat History", elem_classes="chat-area", layout="panel")
+                input_box = gr.Textbox(label="Ask the assistant …", elem_classes="input-area")
+            with gr.Column(scale=1, elem_classes="route-section"):
+                gr.Markdown("### Route Visualization")
+                view_route_btn = gr.Button("Visualize Last Route")
+                route_map = gr.Plot(label="Route Map")
+                route_accordion = gr.Accordion("Navigation Instructions", open=False)
+                with route_accordion:
+                    navigation = gr.Dataframe(
+                        headers=["Section", "Instructions"], datatype=["str", "str"], label="Route Instructions"
+                    )
+
+        async def clear_history():
+            with tracer.start_as_current_span("clear_chat_history") as span:
+                chat = await asyncio.to_thread(_current_chat)
+                new_thread = _take_spare_thread() or await asyncio.to_thread(project_client.agents.create_thread)
+                print(f"Clearing history. Old thread: {chat.thread.id}")
+                chat.thread = new_thread
+                span.set_attribute("new_thread_id", new_thread.id)
+                print(f"New thread: {new_thread.id}")
+                return []
+
+        with gr.Row():
+            clear_button = gr.Button("Clear Chat History")
+
+        gr.Markdown("### Example Questions")
+        with gr.Row():
+            q1 = gr.Button("Who are my clients today?")
+            q2 = gr.Button("Plan my optimal rout (including detailed directions for each leg)?")
+            q4 = gr.Button("Show me a map of my next location")
+        clear_button.click(fn=clear_history, outputs=chatbot).then(lambda: "", outputs=input_box)
+
+        def set_example_question(question):
+            with tracer.start_as_current_span("select_example_question") as span:
+                span.set_attribute("example_question", question)
+                return question
+
+        example_buttons = [q1, q2, q4]
+        for btn in example_buttons:
+            btn.click(lambda x=btn.value: set_example_question(x), inputs=[], outputs=input_box).then(
+                lambda: [], outputs=chatbot
+            ).then(azure_sales_chat, inputs=[input_box, chatbot], outputs=[chatbot, input_box], show_progress="minimal").then(
+                lambda: "", outputs=input_box
+            )
+
+        input_box.submit(
+            azure_sales_chat, inputs=[input_box, chatbot], outputs=[chatbot, input_box], show_progress="minimal"
+        ).then(lambda: "", outputs=input_box)
+
+        async def visualize_route():
+            fig, nav_sections = await asyncio.to_thread(process_route_data)
+            if fig:
+                return fig, nav_sections
+            return None, []
+
+        view_route_btn.click(visualize_route, outputs=[route_map, navigation])
+
+    return demo
+
+
+if __name__ == "__main__":
+    if not CFG.maps_key:
+        print("\n⚠️ WARNING: AZURE_MAPS_KEY environment variable not found!")
+        print("This application requires an Azure Maps API key to function properly.")
+        print("You can set it by running:")
+        print("export AZURE_MAPS_KEY=your_key_here\n")
+
+    build_app().queue().launch(server_name=CFG.server, server_port=CFG.port, share=False, debug=True, show_error=True)
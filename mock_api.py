@@ -1,6 +1,7 @@
 import random
-from datetime import datetime
-from typing import Any, Dict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
 # Sample client data with addresses that work with Azure Maps
 SAMPLE_CLIENTS = [
@@ -30,6 +31,8 @@ SAMPLE_CLIENTS = [
     },
 ]
 
+SAMPLE_CLIENTS_BY_ID = {c["id"]: c for c in SAMPLE_CLIENTS}
+
 # Office/starting location
 OFFICE_LOCATION = {
     "name": "Office",
@@ -51,57 +54,58 @@ def get_todays_clients(count: int = 5) -> Dict[str, Any]:
     # Ensure count is reasonable
     count = min(max(2, count), len(SAMPLE_CLIENTS))
 
-    # Select random clients for today, but in a deterministic way based on current date
-    today = datetime.now()
-    seed = today.year * 10000 + today.month * 100 + today.day
-    random.seed(seed)
+    date_str = datetime.now().strftime("%Y-%m-%d")
 
-    # Select clients for today
-    todays_clients = random.sample(SAMPLE_CLIENTS, count)
+    return {"date": date_str, "office": OFFICE_LOCATION, "clients": list(_todays_clients_cached(date_str, count))}
 
-    return {"date": today.strftime("%Y-%m-%d"), "office": OFFICE_LOCATION, "clients": todays_clients}
 
+@lru_cache(maxsize=32)
+def _todays_clients_cached(date_str: str, count: int) -> Tuple[Dict[str, Any], ...]:
+    """Return the client sample for a date; results are cached per date (which sets the seed) and count."""
+    # Select random clients for today, but in a deterministic way based on current date
+    year, month, day = map(int, date_str.split("-"))
+    rng = random.Random(year * 10000 + month * 100 + day)
+
+    return tuple(rng.sample(SAMPLE_CLIENTS, count))
 
-def get_client_details(client_id: str) -> Dict[str, Any]:
+
+def get_client_details(client_id: str, rng: Optional[random.Random] = None) -> Dict[str, Any]:
     """
     Simulates an API call to get detailed information about a specific client.
 
     Args:
         client_id: The ID of the client to retrieve
+        rng: Random generator for the simulated details (default: the module-level generator)
 
     Returns:
         Dict containing client details or error message
     """
-    for client in SAMPLE_CLIENTS:
-        if client["id"] == client_id:
-            # Simulate additional information that would come from a real API
-            # Generate a random date in the past 15-60 days
-            today = datetime.now()
-            days_ago = random.randint(15, 60)
-            last_visit = today.replace(day=1)  # Move to first day of month
-            for _ in range(days_ago):  # Move back one day at a time
-                last_visit = last_visit.replace(day=max(1, last_visit.day - 1))
-                if last_visit.day == 1:  # If we hit the first of a month
-                    if last_visit.month > 1:
-                        last_visit = last_visit.replace(month=last_visit.month - 1)
-                    else:
-                        last_visit = last_visit.replace(year=last_visit.year - 1, month=12)
-
-            additional_info = {
-                "last_visit": last_visit.strftime("%Y-%m-%d"),
-                "total_purchases": round(random.uniform(5000, 50000), 2),
-                "active_contracts": random.randint(1, 3),
-                "notes": random.choice(
-                    [
-                        "Interested in new product line",
-                        "Looking to expand current services",
-                        "Contract renewal coming up",
-                        "Recently upgraded their subscription",
-                        "Has open support tickets",
-                    ]
-                ),
-            }
-
-            return {**client, **additional_info}
-
-    return {"error": f"Client with ID {client_id} not found"}
+    client = SAMPLE_CLIENTS_BY_ID.get(client_id)
+    if client is None:
+        return {"error": f"Client with ID {client_id} not found"}
+
+    if rng is None:
+        rng = random
+
+    # Simulate additional information that would come from a real API
+    # Generate a random date in the past 15-60 days
+    today = datetime.now()
+    days_ago = rng.randint(15, 60)
+    last_visit = today.replace(day=1) - timedelta(days=days_ago)
+
+    additional_info = {
+        "last_visit": last_visit.strftime("%Y-%m-%d"),
+        "total_purchases": round(rng.uniform(5000, 50000), 2),
+        "active_contracts": rng.randint(1, 3),
+        "notes": rng.choice(
+            [
+                "Interested in new product line",
+                "Looking to expand current services",
+                "Contract renewal coming up",
+                "Recently upgraded their subscription",
+                "Has open support tickets",
+            ]
+        ),
+    }
+
+    return {**client, **additional_info}
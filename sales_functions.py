@@ -3,32 +3,189 @@ Sales functions for route planning and client visits using Azure Maps.
 """
 
 import json
+import math
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional
-from urllib.parse import urlencode
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote_plus, urlencode
 
-import requests
+import httpx
+import numpy as np
 from dotenv import load_dotenv
 
 from mock_api import OFFICE_LOCATION, get_client_details, get_todays_clients
 
-# Load environment variables from .env file
-load_dotenv()
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+# Route payloads run to hundreds of KB; orjson encodes them several times faster than the stdlib.
+# json stays imported for JSONDecodeError, which orjson's own error subclasses.
+if orjson is not None:
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    def _dumps_indented(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _loads = orjson.loads
+else:  # pragma: no cover
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj)
+
+    def _dumps_indented(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode()
+
+    _loads = json.loads
+
+# Load environment variables from .env file; like main.py, .env wins over the shell, since the values below are read once
+load_dotenv(override=True)
+
+# Read once; every route, geocode and map call needs it
+_AZURE_MAPS_KEY = os.environ.get("AZURE_MAPS_KEY", "")
+
+
+# Formats a "lat,lon" pair as Azure Maps expects it; the bound method is looked up once
+_format_coord_pair = "{},{}".format
+
+# The office never moves, so its pair is formatted once
+_OFFICE_COORD_STR = _format_coord_pair(OFFICE_LOCATION["coordinates"]["latitude"], OFFICE_LOCATION["coordinates"]["longitude"])
+
+EARTH_RADIUS_KM = 6371.0
+
+# Up to this many clients the visit order is solved exactly here and Azure Maps only computes directions
+EXACT_ORDER_MAX_CLIENTS = 10
 
 
 # Route planning variables
-current_route = None
-current_client_list = None
-current_visit_index = -1  # -1 means at office, not yet started
+@dataclass
+class SalesDayState:
+    """One sales rep's day: the planned route, the clients in visiting order and the visit reached."""
+
+    route: Optional[Dict] = None
+    route_json: Optional[str] = None  # route serialized once when it is stored
+    clients: Optional[List[Dict]] = None
+    index: int = -1  # -1 means at office, not yet started
+    client_details: Dict[str, Dict] = field(default_factory=dict)  # client id -> details, loaded once the route is planned
+
+
+# The day the current request works on. Callers serving several reps set their own state per request;
+# a context that has none gets a fresh day of its own from current_sales_day.
+sales_day: ContextVar[Optional[SalesDayState]] = ContextVar("sales_day", default=None)
+
+
+def current_sales_day() -> SalesDayState:
+    """Return the current context's sales day, starting a new one if it has none yet."""
+    state = sales_day.get()
+    if state is None:
+        state = SalesDayState()
+        sales_day.set(state)
+    return state
+
 
 # Cache for maps to avoid unnecessary API calls
 map_cache = {}
 
+# (client ids in request order, date) -> (processed route response, its JSON); LRU-bounded
+ROUTE_CACHE_SIZE = 64
+_route_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+# normalized query -> (lat, lon, fetched_at); LRU-bounded with a time-to-live
+GEOCODE_CACHE_SIZE = 1024
+GEOCODE_CACHE_TTL_SECONDS = 86400
+_geocode_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_geocode_lock = threading.Lock()
+
+# Connect timeout, and the timeout for every other phase, in seconds for Azure Maps calls
+AZURE_MAPS_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
+
+# Throttling and server errors are retried up to MAX_RETRIES times with exponential backoff
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.2
+
+try:
+    import h2  # noqa: F401
+
+    _HTTP2 = True
+except ImportError:  # pragma: no cover - HTTP/1.1 fallback
+    _HTTP2 = False
+
+# One keep-alive client for all Azure Maps calls; with h2 installed, concurrent calls share one HTTP/2 connection
+_session = httpx.Client(
+    timeout=AZURE_MAPS_TIMEOUT,
+    # The transport retries failed connections; retryable statuses are handled in _get
+    transport=httpx.HTTPTransport(
+        http2=_HTTP2, retries=MAX_RETRIES, limits=httpx.Limits(max_connections=16, max_keepalive_connections=4)
+    ),
+)
+
+
+def _get(url: str, params: Dict) -> httpx.Response:
+    """GET from Azure Maps, retrying throttled and failed requests; the last response is returned either way."""
+    for attempt in range(MAX_RETRIES + 1):
+        response = _session.get(url, params=params, timeout=AZURE_MAPS_TIMEOUT)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+        time.sleep(RETRY_BACKOFF_SECONDS * 2**attempt)
+
+
+# The last route is dumped to disk for "Visualize Last Route"; a single worker keeps writes ordered
+ROUTE_DUMP_PATH = os.path.abspath(os.environ.get("ROUTE_RESPONSE_PATH", "route_response.json"))
+_route_dump_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="route-dump")
+
+# Static map image endpoint and the settings shared by every generate_location_map call
+_STATIC_MAP_BASE_PARAMS = {"api-version": "1.0", "layer": "basic", "zoom": "15", "width": "800", "height": "600"}
+STATIC_MAP_URL = "https://atlas.microsoft.com/map/static/png"
+
+
+@lru_cache(maxsize=4)
+def _static_map_url_prefix(azure_maps_key: str) -> str:
+    """Static map URL with the key and the fixed settings already encoded."""
+    return f"{STATIC_MAP_URL}?{urlencode({'subscription-key': azure_maps_key, **_STATIC_MAP_BASE_PARAMS})}"
+
+
+# Background Azure Maps work (prefetch_day, warm-up geocodes); tasks never wait on each other in this pool
+_prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sales-prefetch")
+
+
+def _dump_route(route: Dict) -> None:
+    """Write the route to ROUTE_DUMP_PATH, replacing the old file in one step."""
+    tmp_path = ROUTE_DUMP_PATH + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_dumps_indented(route))
+        os.replace(tmp_path, ROUTE_DUMP_PATH)
+    except OSError as e:
+        print(f"Could not write {ROUTE_DUMP_PATH}: {e}")
+
+
+def clear_geocode_cache() -> None:
+    """Forget all cached geocoding results."""
+    with _geocode_lock:
+        _geocode_cache.clear()
+
 
 def get_azure_maps_key() -> str:
-    """Get the Azure Maps API key from environment variables."""
-    return os.environ.get("AZURE_MAPS_KEY", "")
+    """Get the Azure Maps API key read from the environment at import (or at the last refresh_key call)."""
+    return _AZURE_MAPS_KEY
+
+
+def refresh_key() -> str:
+    """Re-read the Azure Maps API key from the environment, e.g. after rotating it."""
+    global _AZURE_MAPS_KEY
+    _AZURE_MAPS_KEY = os.environ.get("AZURE_MAPS_KEY", "")
+    return _AZURE_MAPS_KEY
 
 
 def format_coordinates_for_azure_maps(clients: List[Dict]) -> str:
@@ -41,17 +198,120 @@ def format_coordinates_for_azure_maps(clients: List[Dict]) -> str:
     Returns:
         String formatted for Azure Maps Route API
     """
-    # Start with office coordinates
-    coordinates = [f"{OFFICE_LOCATION['coordinates']['latitude']},{OFFICE_LOCATION['coordinates']['longitude']}"]
+    # Start and end at the office, visiting every client in between
+    parts = (_format_coord_pair(c["coordinates"]["latitude"], c["coordinates"]["longitude"]) for c in clients)
+    return ":".join((_OFFICE_COORD_STR, *parts, _OFFICE_COORD_STR))
+
 
-    # Add all client coordinates
-    for client in clients:
-        coordinates.append(f"{client['coordinates']['latitude']},{client['coordinates']['longitude']}")
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres between two points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
 
-    # End back at the office
-    coordinates.append(f"{OFFICE_LOCATION['coordinates']['latitude']},{OFFICE_LOCATION['coordinates']['longitude']}")
 
-    return ":".join(coordinates)
+def _nearest_neighbor_order(clients: List[Dict]) -> List[int]:
+    """
+    Order clients greedily by always driving to the closest unvisited one, starting at the office.
+
+    Args:
+        clients: List of client dictionaries with coordinates
+
+    Returns:
+        Indices into clients in visiting order
+    """
+    lat = OFFICE_LOCATION["coordinates"]["latitude"]
+    lon = OFFICE_LOCATION["coordinates"]["longitude"]
+    remaining = list(range(len(clients)))
+    order = []
+    while remaining:
+        nearest = min(
+            remaining,
+            key=lambda i: _haversine_km(
+                lat, lon, clients[i]["coordinates"]["latitude"], clients[i]["coordinates"]["longitude"]
+            ),
+        )
+        remaining.remove(nearest)
+        order.append(nearest)
+        lat, lon = clients[nearest]["coordinates"]["latitude"], clients[nearest]["coordinates"]["longitude"]
+    return order
+
+
+def _distance_matrix(places: List[Dict]) -> List[List[float]]:
+    """Haversine distances in kilometres between every pair of places."""
+    lats = np.radians([place["coordinates"]["latitude"] for place in places])
+    lons = np.radians([place["coordinates"]["longitude"] for place in places])
+    a = (
+        np.sin((lats[:, None] - lats[None, :]) / 2) ** 2
+        + np.cos(lats[:, None]) * np.cos(lats[None, :]) * np.sin((lons[:, None] - lons[None, :]) / 2) ** 2
+    )
+    # Plain floats index faster than NumPy scalars in the Held-Karp loops
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).tolist()
+
+
+def _held_karp(dist: List[List[float]]) -> List[int]:
+    """
+    Find the shortest round trip from node 0 through every other node (Held-Karp dynamic programming).
+
+    Args:
+        dist: Square distance matrix; node 0 is where the tour starts and ends
+
+    Returns:
+        The other nodes in visiting order
+    """
+    n = len(dist) - 1
+    if n <= 0:
+        return []
+
+    # best[(mask, j)] = (length of the cheapest path from 0 through the nodes in mask ending at j, node before j)
+    best = {(1 << (j - 1), j): (dist[0][j], 0) for j in range(1, n + 1)}
+    for mask in range(1, 1 << n):
+        for j in range(1, n + 1):
+            bit = 1 << (j - 1)
+            if not mask & bit or mask == bit:
+                continue
+            prev_mask = mask ^ bit
+            best[(mask, j)] = min(
+                (best[(prev_mask, k)][0] + dist[k][j], k) for k in range(1, n + 1) if prev_mask & (1 << (k - 1))
+            )
+
+    mask = (1 << n) - 1
+    _, node = min((best[(mask, j)][0] + dist[j][0], j) for j in range(1, n + 1))
+    order = []
+    while node:
+        order.append(node)
+        mask, node = mask ^ (1 << (node - 1)), best[(mask, node)][1]
+    return order[::-1]
+
+
+def _plan_visit_order(clients: List[Dict]) -> Tuple[List[Dict], bool]:
+    """
+    Order clients for driving from the office and back.
+
+    Args:
+        clients: List of client dictionaries with coordinates
+
+    Returns:
+        The clients in visiting order, and whether that order is optimal
+    """
+    # Sort first so replanning the same clients gives the same order (a tour and its reverse tie)
+    clients = sorted(clients, key=lambda client: client["id"])
+    if len(clients) <= EXACT_ORDER_MAX_CLIENTS:
+        order = _held_karp(_distance_matrix([OFFICE_LOCATION, *clients]))
+        return [clients[node - 1] for node in order], True
+    return [clients[i] for i in _nearest_neighbor_order(clients)], False
+
+
+def _route_cache_key(clients: List[Dict]) -> tuple:
+    """Key a planned route by the client ids in visiting order and today's date."""
+    return tuple(client["id"] for client in clients), datetime.now().strftime("%Y-%m-%d")
+
+
+def _load_client_details(state: SalesDayState) -> None:
+    """Fetch details for every client of the day that has none yet, so visits only look them up."""
+    for client in state.clients:
+        if client["id"] not in state.client_details:
+            state.client_details[client["id"]] = get_client_details(client["id"])
 
 
 def get_clients_for_today() -> str:
@@ -61,14 +321,18 @@ def get_clients_for_today() -> str:
     Returns:
         JSON string with client information
     """
+    return _dumps(_get_clients_for_today_impl())
+
+
+def _get_clients_for_today_impl() -> Dict:
     # Reset current state
-    global current_visit_index, current_client_list
-    current_visit_index = -1
+    state = current_sales_day()
+    state.index = -1
 
     try:
         # Call the mock API
         result = get_todays_clients(count=4)  # Get 4 clients for today
-        current_client_list = result["clients"]
+        state.clients = result["clients"]
 
         # Format the result for display
         formatted_result = {
@@ -86,11 +350,11 @@ def get_clients_for_today() -> str:
             ],
         }
 
-        return json.dumps(formatted_result)
+        return formatted_result
 
     except Exception as e:
         error_msg = f"Error retrieving today's clients: {str(e)}"
-        return json.dumps({"error": error_msg})
+        return {"error": error_msg}
 
 
 def plan_optimal_route() -> str:
@@ -100,54 +364,71 @@ def plan_optimal_route() -> str:
     Returns:
         JSON string with the planned route information
     """
-    global current_route
+    state = current_sales_day()
+    result = _plan_optimal_route_impl()
+    if result is state.route and state.route_json is not None:
+        return state.route_json
+    return _dumps(result)
+
+
+def _plan_optimal_route_impl() -> Dict:
+    state = current_sales_day()
 
     try:
         # Check if we have clients
-        if not current_client_list:
-            clients_today_result = get_clients_for_today()
-            clients_today_data = json.loads(clients_today_result)
+        if not state.clients:
+            clients_today_data = _get_clients_for_today_impl()
             if "error" in clients_today_data:
-                return clients_today_result
+                return clients_today_data
 
             # If still no clients after getting today's list
-            if not current_client_list:
-                return json.dumps(
-                    {
-                        "message": "No clients scheduled for today.",
-                        "total_distance_km": 0,
-                        "total_duration_minutes": 0,
-                        "start_time": datetime.now().strftime("%H:%M"),
-                        "end_time": datetime.now().strftime("%H:%M"),
-                        "optimized_client_order": [],
-                        "itinerary": [
-                            {
-                                "leg_number": 1,
-                                "origin": OFFICE_LOCATION["name"],
-                                "origin_address": OFFICE_LOCATION["address"],
-                                "destination": OFFICE_LOCATION["name"],
-                                "destination_address": OFFICE_LOCATION["address"],
-                                "distance_km": 0,
-                                "duration_minutes": 0,
-                                "travel_instructions": ["Remain at office - no client visits scheduled"],
-                            }
-                        ],
-                    }
-                )
+            if not state.clients:
+                return {
+                    "message": "No clients scheduled for today.",
+                    "total_distance_km": 0,
+                    "total_duration_minutes": 0,
+                    "start_time": datetime.now().strftime("%H:%M"),
+                    "end_time": datetime.now().strftime("%H:%M"),
+                    "optimized_client_order": [],
+                    "itinerary": [
+                        {
+                            "leg_number": 1,
+                            "origin": OFFICE_LOCATION["name"],
+                            "origin_address": OFFICE_LOCATION["address"],
+                            "destination": OFFICE_LOCATION["name"],
+                            "destination_address": OFFICE_LOCATION["address"],
+                            "distance_km": 0,
+                            "duration_minutes": 0,
+                            "travel_instructions": ["Remain at office - no client visits scheduled"],
+                        }
+                    ],
+                }
 
         # Get Azure Maps key
         azure_maps_key = get_azure_maps_key()
         if not azure_maps_key:
             error_msg = "Azure Maps API key not found in environment variables"
-            return json.dumps({"error": error_msg})
+            return {"error": error_msg}
 
-        # Make a copy of the current client list to preserve original order for indexing
-        original_clients_for_route = list(current_client_list)
-        if not original_clients_for_route:
-            return json.dumps({"message": "No clients to plan a route for.", "itinerary": []})
+        if not state.clients:
+            return {"message": "No clients to plan a route for.", "itinerary": []}
+
+        # Decide the visit order locally so get_next_visit follows the route legs; once visits have started it stays put
+        if state.index < 0:
+            state.clients, order_is_final = _plan_visit_order(state.clients)
+        else:
+            order_is_final = True
+
+        cache_key = _route_cache_key(state.clients)
+        cached = _route_cache.get(cache_key)
+        if cached is not None:
+            _route_cache.move_to_end(cache_key)
+            state.route, state.route_json = cached
+            _load_client_details(state)
+            return state.route
 
         # Format coordinates for Azure Maps
-        coordinates_query = format_coordinates_for_azure_maps(original_clients_for_route)
+        coordinates_query = format_coordinates_for_azure_maps(state.clients)
 
         # Prepare request to Azure Maps Route API
         url = "https://atlas.microsoft.com/route/directions/json"
@@ -155,65 +436,71 @@ def plan_optimal_route() -> str:
             "subscription-key": azure_maps_key,
             "api-version": "1.0",
             "query": coordinates_query,
-            "computeBestOrder": "true",
+            # Only long lists still need Azure's best-order search; it starts from the nearest-neighbour order
+            "computeBestOrder": "false" if order_is_final else "true",
             "routeType": "fastest",
             "traffic": "true",
             "travelMode": "car",
             "instructionsType": "text",
             "computeTravelTimeFor": "all",
+            # Leave the per-leg point arrays out of the response; they are most of the payload and never used
+            "routeRepresentation": "summaryOnly",
         }
 
         print(f"Requesting route with params: {params}")
 
-        response = requests.get(url, params=params)
+        response = _get(url, params)
 
         # First check HTTP status code
         if response.status_code != 200:
             error_msg = f"Azure Maps API request failed with status {response.status_code}"
-            return json.dumps({"error": error_msg})
+            return {"error": error_msg}
 
         response_data = response.json()
 
         # Validate response structure
         if not response_data:
-            return json.dumps({"error": "Empty response from Azure Maps API"})
+            return {"error": "Empty response from Azure Maps API"}
 
         # Check for API error response
         if "error" in response_data:
             error_detail = response_data.get("error", {})
             error_code = error_detail.get("code", "unknown")
             error_message = error_detail.get("message", "Unknown Azure Maps API error")
-            return json.dumps({"error": f"Azure Maps API error: {error_code} - {error_message}", "request_params": params})
+            return {"error": f"Azure Maps API error: {error_code} - {error_message}", "request_params": params}
 
         # Validate route data
         routes = response_data.get("routes", [])
         if not routes:
-            return json.dumps({"error": "No route data received from Azure Maps API", "api_response": response_data})
+            return {"error": "No route data received from Azure Maps API", "api_response": response_data}
 
-        # Process route data - clean up large point arrays
+        # Process route data - clean up large point arrays should the service still send any
         for route in response_data["routes"]:
             for leg in route["legs"]:
                 leg.pop("points", None)
 
         # Save the route data
-        global current_route
-        current_route = response_data
+        state.route = response_data
+        state.route_json = _dumps(response_data)
+        _route_cache[cache_key] = (state.route, state.route_json)
+        if len(_route_cache) > ROUTE_CACHE_SIZE:
+            _route_cache.popitem(last=False)
+        _load_client_details(state)
 
-        # Log the processed response for debugging
-        with open("route_response.json", "w") as f:
-            json.dump(response_data, f, indent=2)
+        # Log the processed response off the request path; indenting a large route is the slow part
+        _route_dump_executor.submit(_dump_route, response_data)
 
-        return json.dumps(response_data)
+        return response_data
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         error_msg = f"Network error while calling Azure Maps API: {str(e)}"
-        return json.dumps({"error": error_msg})
+        return {"error": error_msg}
     except json.JSONDecodeError as e:
         error_msg = f"Invalid JSON response from Azure Maps API: {str(e)}"
-        return json.dumps({"error": error_msg})
+        return {"error": error_msg}
     except Exception as e:
         error_msg = f"Unexpected error planning route: {str(e)}"
-        return json.dumps({"error": error_msg})
+        return {"error": error_msg}
 
 
 def get_next_visit() -> str:
@@ -223,22 +510,21 @@ def get_next_visit() -> str:
     Returns:
         JSON string with next visit information
     """
-    global current_visit_index
+    state = current_sales_day()
 
     try:
         # Check if we have a route planned
-        if not current_client_list:
-            plan_result = plan_optimal_route()
-            plan_data = json.loads(plan_result)
+        if not state.clients:
+            plan_data = _plan_optimal_route_impl()
             if "error" in plan_data:
-                return plan_result
+                return _dumps(plan_data)
 
         # Increment the visit index
-        current_visit_index += 1
+        state.index += 1
 
         # Check if we've completed all visits
-        if current_visit_index >= len(current_client_list):
-            return json.dumps(
+        if state.index >= len(state.clients):
+            return _dumps(
                 {
                     "message": "All client visits completed. Returning to office.",
                     "location": "Office",
@@ -248,15 +534,17 @@ def get_next_visit() -> str:
             )
 
         # Get the next client
-        next_client = current_client_list[current_visit_index]
+        next_client = state.clients[state.index]
 
-        # Get additional details
-        client_details = get_client_details(next_client["id"])
+        # Get additional details, normally loaded when the route was planned
+        client_details = state.client_details.get(next_client["id"])
+        if client_details is None:
+            client_details = state.client_details[next_client["id"]] = get_client_details(next_client["id"])
 
         # Format the result
         result = {
-            "visit_number": current_visit_index + 1,
-            "total_visits": len(current_client_list),
+            "visit_number": state.index + 1,
+            "total_visits": len(state.clients),
             "client_id": next_client["id"],
             "client_name": next_client["name"],
             "contact_person": next_client["contact"],
@@ -268,11 +556,11 @@ def get_next_visit() -> str:
             "status": "in_progress",
         }
 
-        return json.dumps(result)
+        return _dumps(result)
 
     except Exception as e:
         error_msg = f"Error getting next visit: {str(e)}"
-        return json.dumps({"error": error_msg})
+        return _dumps({"error": error_msg})
 
 
 def get_current_visit_status() -> str:
@@ -282,19 +570,19 @@ def get_current_visit_status() -> str:
     Returns:
         JSON string with current visit information
     """
+    state = current_sales_day()
 
     try:
         # Check if we have a route planned
-        if not current_client_list:
-            plan_result = plan_optimal_route()
-            plan_data = json.loads(plan_result)
+        if not state.clients:
+            plan_data = _plan_optimal_route_impl()
             if "error" in plan_data:
-                return plan_result
+                return _dumps(plan_data)
 
         # Check visit index status
-        if current_visit_index < 0:
+        if state.index < 0:
             # Not started any visits yet
-            return json.dumps(
+            return _dumps(
                 {
                     "message": "Sales day not yet started. Currently at office.",
                     "location": "Office",
@@ -303,29 +591,29 @@ def get_current_visit_status() -> str:
                     "status": "not_started",
                 }
             )
-        elif current_visit_index >= len(current_client_list):
+        elif state.index >= len(state.clients):
             # Completed all visits
-            return json.dumps(
+            return _dumps(
                 {
                     "message": "All client visits completed. Returned to office.",
                     "location": "Office",
                     "address": OFFICE_LOCATION["address"],
                     "status": "completed",
                     "summary": {
-                        "total_visits": len(current_client_list),
-                        "clients_visited": [client["name"] for client in current_client_list],
+                        "total_visits": len(state.clients),
+                        "clients_visited": [client["name"] for client in state.clients],
                     },
                 }
             )
         else:
             # In progress - get current client
-            current_client = current_client_list[current_visit_index]
-            remaining = len(current_client_list) - current_visit_index - 1
+            current_client = state.clients[state.index]
+            remaining = len(state.clients) - state.index - 1
 
             result = {
                 "message": f"Currently visiting {current_client['name']}",
-                "visit_number": current_visit_index + 1,
-                "total_visits": len(current_client_list),
+                "visit_number": state.index + 1,
+                "total_visits": len(state.clients),
                 "remaining_visits": remaining,
                 "client_id": current_client["id"],
                 "client_name": current_client["name"],
@@ -339,11 +627,48 @@ def get_current_visit_status() -> str:
                 "status": "in_progress",
             }
 
-            return json.dumps(result)
+            return _dumps(result)
 
     except Exception as e:
         error_msg = f"Error getting visit status: {str(e)}"
-        return json.dumps({"error": error_msg})
+        return _dumps({"error": error_msg})
+
+
+def _geocode(query: str) -> Dict:
+    """
+    Look up the coordinates of an address, using the geocode cache.
+
+    Args:
+        query: Address or place to look up
+
+    Returns:
+        Dictionary with lat and lon, or with an error message
+    """
+    cache_key = " ".join(query.lower().split())
+    with _geocode_lock:
+        cached = _geocode_cache.get(cache_key)
+        if cached is not None and time.time() - cached[2] < GEOCODE_CACHE_TTL_SECONDS:
+            _geocode_cache.move_to_end(cache_key)
+            return {"lat": cached[0], "lon": cached[1]}
+
+    geocode_url = "https://atlas.microsoft.com/search/address/json"
+    geocode_params = {"subscription-key": get_azure_maps_key(), "api-version": "1.0", "query": query}
+
+    geocode_response = _get(geocode_url, geocode_params)
+    if geocode_response.status_code != 200:
+        return {"error": f"Geocoding failed: {geocode_response.text}"}
+
+    geocode_data = geocode_response.json()
+    if not geocode_data.get("results"):
+        return {"error": "Location not found"}
+
+    position = geocode_data["results"][0]["position"]
+    with _geocode_lock:
+        _geocode_cache[cache_key] = (position["lat"], position["lon"], time.time())
+        _geocode_cache.move_to_end(cache_key)
+        if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+            _geocode_cache.popitem(last=False)
+    return {"lat": position["lat"], "lon": position["lon"]}
 
 
 def generate_location_map(query: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> str:
@@ -358,69 +683,53 @@ def generate_location_map(query: Optional[str] = None, lat: Optional[float] = No
     Returns:
         JSON string with the map URL and location details
     """
+    state = current_sales_day()
     try:
         # Check and prepare location parameters
         if not query and (lat is None or lon is None):
             # If no parameters, use current visit location
-            if current_client_list and 0 <= current_visit_index < len(current_client_list):
-                client = current_client_list[current_visit_index]
+            if state.clients and 0 <= state.index < len(state.clients):
+                client = state.clients[state.index]
                 lat = float(client["coordinates"]["latitude"])
                 lon = float(client["coordinates"]["longitude"])
                 query = client["address"]
                 location_name = client["name"]
             else:
                 error_msg = "No location specified and no current visit active"
-                return json.dumps({"error": error_msg})
+                return _dumps({"error": error_msg})
         elif query and not lat and not lon:
             # If we only have a query, we need to geocode it first
-            geocode_url = "https://atlas.microsoft.com/search/address/json"
-            geocode_params = {"subscription-key": get_azure_maps_key(), "api-version": "1.0", "query": query}
-
-            geocode_response = requests.get(geocode_url, params=geocode_params)
-            if geocode_response.status_code != 200:
-                return json.dumps({"error": f"Geocoding failed: {geocode_response.text}"})
-
-            geocode_data = geocode_response.json()
-            if not geocode_data.get("results"):
-                return json.dumps({"error": "Location not found"})
-
-            result = geocode_data["results"][0]
-            lat = result["position"]["lat"]
-            lon = result["position"]["lon"]
+            position = _geocode(query)
+            if "error" in position:
+                return _dumps(position)
+            lat, lon = position["lat"], position["lon"]
             location_name = query
         elif lat is not None and lon is not None:
             location_name = f"Location at {lat}, {lon}"
             if not query:
                 query = f"{lat},{lon}"
 
-        # Validate coordinates
-        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
-            return json.dumps({"error": "Invalid coordinates provided"})
+        # Validate coordinates; numeric strings are fine, booleans, nan and inf are not
+        try:
+            if isinstance(lat, bool) or isinstance(lon, bool):
+                raise TypeError("coordinates must be numbers")
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return _dumps({"error": "Invalid coordinates provided"})
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return _dumps({"error": "Invalid coordinates provided"})
 
         # Get Azure Maps key
         azure_maps_key = get_azure_maps_key()
         if not azure_maps_key:
-            return json.dumps({"error": "Azure Maps API key not found"})
+            return _dumps({"error": "Azure Maps API key not found"})
 
         # Format pin parameters according to Azure Maps API specs
         # Format should be: "default||<lon> <lat>"
         pin_param = f"default||{lon} {lat}"
 
-        # Create map URL with parameters
-        params = {
-            "subscription-key": azure_maps_key,
-            "api-version": "1.0",
-            "layer": "basic",
-            "zoom": "15",
-            "width": "800",
-            "height": "600",
-            "center": f"{lon},{lat}",
-            "pins": pin_param,
-        }
-
-        # Build the Azure Maps static image URL
-        url = "https://atlas.microsoft.com/map/static/png"
-        map_url = f"{url}?{urlencode(params)}"
+        # Build the Azure Maps static image URL; only the location is encoded per call
+        map_url = f"{_static_map_url_prefix(azure_maps_key)}&center={quote_plus(f'{lon},{lat}')}&pins={quote_plus(pin_param)}"
 
         # Return the result with the map URL
         result = {
@@ -431,12 +740,28 @@ def generate_location_map(query: Optional[str] = None, lat: Optional[float] = No
             "_chat_display": {"type": "image", "url": map_url, "title": f"Map of {location_name}"},
         }
 
-        return json.dumps(result)
+        return _dumps(result)
 
-    except requests.exceptions.RequestException as e:
-        return json.dumps({"error": f"Network error: {str(e)}"})
+    except httpx.HTTPError as e:
+        return _dumps({"error": f"Network error: {str(e)}"})
     except Exception as e:
-        return json.dumps({"error": f"Error generating map: {str(e)}"})
+        return _dumps({"error": f"Error generating map: {str(e)}"})
+
+
+def prefetch_day() -> Future:
+    """
+    Start the day in the background: load today's clients and plan the route.
+
+    Returns:
+        Future resolving to the planned route dictionary (or an error dictionary)
+    """
+
+    def plan_day() -> Dict:
+        clients = _get_clients_for_today_impl()
+        return clients if "error" in clients else _plan_optimal_route_impl()
+
+    # Plan in the caller's context so the route lands in the caller's sales day
+    return _prefetch_executor.submit(copy_context().run, plan_day)
 
 
 def reset_sales_day() -> str:
@@ -446,38 +771,50 @@ def reset_sales_day() -> str:
     Returns:
         JSON string with confirmation message
     """
-    global current_route, current_client_list, current_visit_index
+    state = current_sales_day()
 
-    # Reset all globals
-    current_route = None
-    current_client_list = None
-    current_visit_index = -1
+    # Reset the whole day; only this day's route leaves the cache, other reps' days keep theirs
+    if state.clients:
+        _route_cache.pop(_route_cache_key(state.clients), None)
+    state.route = None
+    state.route_json = None
+    state.clients = None
+    state.index = -1
+    state.client_details.clear()
 
-    return json.dumps({"message": "Sales day has been reset. You can now plan a new route.", "status": "success"})
+    return _dumps({"message": "Sales day has been reset. You can now plan a new route.", "status": "success"})
+
+
+def _print_json(data) -> None:
+    """Pretty-print a tool result, given either as a dictionary or as its JSON string."""
+    print(_dumps_indented(_loads(data) if isinstance(data, str) else data).decode())
 
 
 def main():
     """Test all Azure Maps functionality."""
     try:
+        # Plan the route and geocode step 6's query concurrently; the checks below then mostly hit the caches
+        day = prefetch_day()
+        _prefetch_executor.submit(_geocode, "Zurich, Switzerland")
+        day.result()
+
         print("\n1. Testing get_clients_for_today()...")
-        clients_result = get_clients_for_today()
-        print(json.dumps(json.loads(clients_result), indent=2))
+        _print_json(_get_clients_for_today_impl())
 
         print("\n2. Testing plan_optimal_route()...")
-        route_result = plan_optimal_route()
-        print(json.dumps(json.loads(route_result), indent=2))
+        _print_json(_plan_optimal_route_impl())
 
         print("\n3. Testing get_next_visit() - First client...")
         visit_result = get_next_visit()
-        print(json.dumps(json.loads(visit_result), indent=2))
+        _print_json(visit_result)
 
         print("\n4. Testing get_current_visit_status()...")
         status_result = get_current_visit_status()
-        print(json.dumps(json.loads(status_result), indent=2))
+        _print_json(status_result)
 
         print("\n5. Testing generate_location_map() for current location...")
         map_result = generate_location_map()
-        map_data = json.loads(map_result)
+        map_data = _loads(map_result)
         if "error" in map_data:
             print("Map error:", map_data["error"])
         else:
@@ -486,7 +823,7 @@ def main():
 
         print("\n6. Testing generate_location_map() with query...")
         map_query_result = generate_location_map(query="Zurich, Switzerland")
-        map_query_data = json.loads(map_query_result)
+        map_query_data = _loads(map_query_result)
         if "error" in map_query_data:
             print("Map query error:", map_query_data["error"])
         else:
@@ -497,14 +834,14 @@ def main():
         for _ in range(2):
             visit_result = get_next_visit()
             print("\nNext visit:")
-            print(json.dumps(json.loads(visit_result), indent=2))
+            _print_json(visit_result)
             status_result = get_current_visit_status()
             print("\nCurrent status:")
-            print(json.dumps(json.loads(status_result), indent=2))
+            _print_json(status_result)
 
         print("\n8. Testing reset_sales_day()...")
         reset_result = reset_sales_day()
-        print(json.dumps(json.loads(reset_result), indent=2))
+        _print_json(reset_result)
 
     except Exception as e:
         print(f"Error during testing: {str(e)}")
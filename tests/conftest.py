@@ -51,5 +51,17 @@ def azure_maps_key():
 @pytest.fixture
 def mock_env_azure_maps_key():
     """Fixture to mock the AZURE_MAPS_KEY environment variable."""
+    import sales_functions
+
     with patch.dict(os.environ, {"AZURE_MAPS_KEY": "mock_azure_maps_key_for_testing"}):
+        sales_functions.refresh_key()
         yield
+    sales_functions.refresh_key()
+
+
+@pytest.fixture
+def unchunked_mock_stream(monkeypatch):
+    """Fixture to send MockStream message text as a single delta for tests that don't check chunking."""
+    from tests.mock_services import MockStream
+
+    monkeypatch.setattr(MockStream, "streaming_enabled", False)
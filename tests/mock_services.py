@@ -2,15 +2,54 @@
 Mock services for testing, especially UI tests with Playwright.
 """
 
+import functools
 import json
-from unittest.mock import MagicMock
+from collections import defaultdict
+from datetime import date
+from types import SimpleNamespace
 
+from azure.core.exceptions import ResourceNotFoundError
+
+import sales_functions
 from mock_api import get_client_details, get_todays_clients
 
+# Assistant message templates, filled from the matching canned response
+_CLIENTS_TEXT = (
+    "Here are your clients for today ({date}):\n\n{clients_list}\n\nWould you like me to plan your optimal route for the day?"
+)
+_ROUTE_TEXT = (
+    "I've planned your optimal route for today. The total distance is {total_distance_km} km "
+    "and will take about {total_duration_minutes} minutes.\n\n"
+    "The order of visits is: {order_str}"
+)
+_MAP_TEXT = "Here's a map showing the location of {location_name}."
+_NEXT_VISIT_TEXT = (
+    "Your next visit is {client_name} at {address}. This is visit {visit_number} out of {total_visits}. Note: {notes}"
+)
+
+
+def _todays_clients(count):
+    """Today's clients from the mock API, computed once per day and count."""
+    return _todays_clients_for(date.today(), count)
+
+
+@functools.lru_cache(maxsize=8)
+def _todays_clients_for(day, count):
+    """Cached mock API call; day is only part of the cache key, so a new day starts a new entry."""
+    return get_todays_clients(count=count)
+
+
+@functools.lru_cache(maxsize=128)
+def _client_details(client_id):
+    """Mock API details for a client, computed once per process."""
+    return get_client_details(client_id)
+
 
 class MockThread:
     """Mock implementation of Azure AI Projects Thread."""
 
+    __slots__ = ("id", "status")
+
     def __init__(self, thread_id="mock-thread-123"):
         self.id = thread_id
         self.status = "active"
@@ -19,6 +58,8 @@ class MockThread:
 class MockAgent:
     """Mock implementation of Azure AI Projects Agent."""
 
+    __slots__ = ("id", "name", "model")
+
     def __init__(self, agent_id="mock-agent-123", name="mock-sales-agent", model="gpt-4o"):
         self.id = agent_id
         self.name = name
@@ -31,7 +72,7 @@ class MockAgentService:
     def __init__(self):
         self.agents = {}
         self.threads = {}
-        self.messages = {}
+        self.messages = defaultdict(list)
 
     def create_agent(self, model, name, instructions, toolset):
         """Create a mock agent."""
@@ -47,9 +88,15 @@ class MockAgentService:
             return self.agents[assistant_id]
         return self.create_agent(model, name, instructions, toolset)
 
+    def get_agent(self, assistant_id):
+        """Get a mock agent by id."""
+        if assistant_id not in self.agents:
+            raise ResourceNotFoundError(f"Agent {assistant_id} not found")
+        return self.agents[assistant_id]
+
     def list_agents(self):
         """List all mock agents."""
-        return MagicMock(data=list(self.agents.values()))
+        return SimpleNamespace(data=list(self.agents.values()))
 
     def create_thread(self):
         """Create a mock thread."""
@@ -59,9 +106,6 @@ class MockAgentService:
 
     def create_message(self, thread_id, role, content):
         """Create a mock message in a thread."""
-        if thread_id not in self.messages:
-            self.messages[thread_id] = []
-
         message_id = f"message-{len(self.messages[thread_id])}"
         self.messages[thread_id].append(
             {"id": message_id, "thread_id": thread_id, "role": role, "content": content, "status": "completed"}
@@ -73,6 +117,31 @@ class MockAgentService:
         return MockStream(thread_id, assistant_id, event_handler, self)
 
 
+class MockConnectionService:
+    """Mock implementation of the connection service from Azure AI Projects."""
+
+    def get(self, connection_name):
+        """Get a mock connection by name."""
+        return SimpleNamespace(id=f"mock-connection-{connection_name}", name=connection_name)
+
+
+class MockResponse:
+    """Mock httpx.Response for mocked Azure Maps calls."""
+
+    def __init__(self, json_data=None, status_code=200):
+        self.json_data = {} if json_data is None else json_data
+        self.status_code = status_code
+
+    @property
+    def text(self):
+        """Return the JSON body as text, serialized only when read."""
+        return sales_functions._dumps(self.json_data)
+
+    def json(self):
+        """Return JSON data from the mock response."""
+        return self.json_data
+
+
 class MockMapsService:
     """Mock implementation for Azure Maps services."""
 
@@ -122,25 +191,50 @@ class MockMapsService:
 class MockStream:
     """Simulate a stream of events from the Azure AI Projects API."""
 
+    __slots__ = ("thread_id", "assistant_id", "event_handler", "agent_service")
+
+    # Keywords that select a canned response, checked in this order
+    _KEYWORDS = (
+        "who are my clients today",
+        "plan my optimal route",
+        "show me a map",
+        "what is my next visit",
+        "reset my day",
+    )
+    # Tool reported for each keyword's canned response; the others answer without a tool call
+    _TOOL_NAMES = {
+        "who are my clients today": "get_clients_for_today",
+        "plan my optimal route": "plan_optimal_route",
+        "show me a map": "generate_location_map",
+    }
+    # Characters per simulated message delta
+    CHUNK_SIZE = 20
+    # When False, the message text is sent as one delta instead of simulated chunks
+    streaming_enabled = True
+    _DEFAULT_RESPONSE = {"message": "I understood your request. How can I help you with your sales planning today?"}
+
     def __init__(self, thread_id, assistant_id, event_handler, agent_service):
         self.thread_id = thread_id
         self.assistant_id = assistant_id
         self.event_handler = event_handler
         self.agent_service = agent_service
-        self.maps_service = MockMapsService()
-
-        # Pre-defined responses to common queries
-        self.responses = {
-            "who are my clients today": self._get_clients_response(),
-            "plan my optimal route": self._get_route_response(),
-            "show me a map": self._get_map_response(),
-            "what is my next visit": self._get_next_visit_response(),
+
+    @classmethod
+    @functools.lru_cache(maxsize=1)
+    def _get_cached_responses(cls):
+        """Build the canned responses shared by every stream."""
+        return {
+            "who are my clients today": cls._get_clients_response(),
+            "plan my optimal route": cls._get_route_response(),
+            "show me a map": cls._get_map_response(),
+            "what is my next visit": cls._get_next_visit_response(),
             "reset my day": {"message": "Sales day has been reset. You can now plan a new route.", "status": "success"},
         }
 
-    def _get_clients_response(self):
+    @staticmethod
+    def _get_clients_response():
         """Generate a response for the clients list request."""
-        result = get_todays_clients(count=3)
+        result = _todays_clients(3)
         return {
             "date": result["date"],
             "client_count": len(result["clients"]),
@@ -156,10 +250,11 @@ class MockStream:
             ],
         }
 
-    def _get_route_response(self):
+    @staticmethod
+    def _get_route_response():
         """Generate a response for the route planning request."""
-        clients = get_todays_clients(count=3)["clients"]
-        route_data = self.maps_service.generate_route()
+        clients = _todays_clients(3)["clients"]
+        route_data = MockMapsService.generate_route()
 
         return {
             "message": "Route planned successfully",
@@ -171,10 +266,11 @@ class MockStream:
             "routes": route_data["routes"],
         }
 
-    def _get_map_response(self):
+    @staticmethod
+    def _get_map_response():
         """Generate a mock map response."""
         lat, lon = 47.3698, 8.539185
-        mock_map_url = self.maps_service.generate_static_map(lat, lon)
+        mock_map_url = MockMapsService.generate_static_map(lat, lon)
 
         return {
             "location_name": "Swiss Banking Corp",
@@ -188,11 +284,12 @@ class MockStream:
             },
         }
 
-    def _get_next_visit_response(self):
+    @staticmethod
+    def _get_next_visit_response():
         """Generate a response for the next visit request."""
-        clients = get_todays_clients(count=3)["clients"]
+        clients = _todays_clients(3)["clients"]
         client = clients[0]
-        client_details = get_client_details(client["id"])
+        client_details = _client_details(client["id"])
 
         return {
             "visit_number": 1,
@@ -208,17 +305,82 @@ class MockStream:
             "status": "in_progress",
         }
 
-    def _find_matching_response(self, user_message):
-        """Find a matching response based on user message content."""
-        lower_message = user_message.lower()
+    def _match_keyword(self, user_message):
+        """Return the keyword of the canned response matching a user message, or None."""
+        lower_message = user_message if user_message.islower() else user_message.lower()
 
-        # Find the best match based on keywords
-        for key in self.responses:
-            if key in lower_message:
-                return self.responses[key]
+        # Find the best match based on keywords, in priority order
+        for keyword in self._KEYWORDS:
+            if keyword in lower_message:
+                return keyword
+        return None
 
-        # Default response if no match found
-        return {"message": "I understood your request. How can I help you with your sales planning today?"}
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _events_for(cls, keyword):
+        """Build the tool events and message text chunks for a canned response (None for the default) once."""
+        response = cls._get_cached_responses()[keyword] if keyword else cls._DEFAULT_RESPONSE
+
+        # First a step delta to indicate tool usage, then the run step completion
+        tool_events = ()
+        tool_name = cls._TOOL_NAMES.get(keyword)
+        if tool_name is not None:
+            tool_events = (
+                (
+                    "thread.run.step.delta",
+                    {
+                        "delta": {
+                            "step_details": {
+                                "type": "tool_calls",
+                                "tool_calls": [
+                                    {
+                                        "id": "tool-call-1",
+                                        "type": "function",
+                                        "function": {"name": tool_name, "arguments": "{}"},
+                                    }
+                                ],
+                            }
+                        }
+                    },
+                ),
+                (
+                    "run_step",
+                    {
+                        "id": "step-1",
+                        "type": "tool_calls",
+                        "status": "completed",
+                        "step_details": {
+                            "tool_calls": [
+                                {
+                                    "id": "tool-call-1",
+                                    "type": "function",
+                                    "function": {"name": tool_name, "output": json.dumps(response)},
+                                }
+                            ]
+                        },
+                    },
+                ),
+            )
+
+        # Message text chunks (simulating streaming)
+        text_response = cls._text_for(response)
+        chunks = tuple(text_response[i : i + cls.CHUNK_SIZE] for i in range(0, len(text_response), cls.CHUNK_SIZE))
+        return tool_events, chunks
+
+    @staticmethod
+    def _text_for(response):
+        """Generate assistant message text based on the response content."""
+        if "clients" in response:
+            return _CLIENTS_TEXT.format_map(
+                {**response, "clients_list": "\n".join(f"- {client['name']}" for client in response["clients"])}
+            )
+        if "routes" in response:
+            return _ROUTE_TEXT.format_map({**response, "order_str": ", ".join(response["optimized_client_order"])})
+        if "map_url" in response:
+            return _MAP_TEXT.format_map(response)
+        if "visit_number" in response:
+            return _NEXT_VISIT_TEXT.format_map(response)
+        return response.get("message", "How else can I assist you with your sales planning today?")
 
     def __enter__(self):
         return self
@@ -232,85 +394,21 @@ class MockStream:
         if not messages:
             return
 
-        user_messages = [m for m in messages if m["role"] == "user"]
-        if not user_messages:
+        # The user's message is normally the last one, so scan from the end
+        latest_user_message = next((m["content"] for m in reversed(messages) if m["role"] == "user"), None)
+        if latest_user_message is None:
             return
 
-        latest_user_message = user_messages[-1]["content"]
-        response = self._find_matching_response(latest_user_message)
+        tool_events, chunks = self._events_for(self._match_keyword(latest_user_message))
 
         # Create a unique message ID for the response
         message_id = f"response-{len(messages)}"
 
-        # First yield a step delta to indicate tool usage
-        if "clients" in response or "routes" in response or "map_url" in response:
-            tool_name = (
-                "get_clients_for_today"
-                if "clients" in response
-                else "plan_optimal_route" if "routes" in response else "generate_location_map"
-            )
-            yield (
-                "thread.run.step.delta",
-                {
-                    "delta": {
-                        "step_details": {
-                            "type": "tool_calls",
-                            "tool_calls": [
-                                {"id": "tool-call-1", "type": "function", "function": {"name": tool_name, "arguments": "{}"}}
-                            ],
-                        }
-                    }
-                },
-            )
-
-            # Then yield a run step completion
-            yield (
-                "run_step",
-                {
-                    "id": "step-1",
-                    "type": "tool_calls",
-                    "status": "completed",
-                    "step_details": {
-                        "tool_calls": [
-                            {
-                                "id": "tool-call-1",
-                                "type": "function",
-                                "function": {"name": tool_name, "output": json.dumps(response)},
-                            }
-                        ]
-                    },
-                },
-            )
-
-        # Generate assistant message text based on the response content
-        text_response = ""
-        if "clients" in response:
-            clients_list = "\n".join([f"- {client['name']}" for client in response["clients"]])
-            text_response = (
-                f"Here are your clients for today ({response['date']}):\n\n{clients_list}\n\n"
-                "Would you like me to plan your optimal route for the day?"
-            )
-        elif "routes" in response:
-            text_response = (
-                f"I've planned your optimal route for today. The total distance is {response['total_distance_km']} km "
-                f"and will take about {response['total_duration_minutes']} minutes.\n\n"
-                f"The order of visits is: {', '.join(response['optimized_client_order'])}"
-            )
-        elif "map_url" in response:
-            text_response = f"Here's a map showing the location of {response['location_name']}."
-        elif "visit_number" in response:
-            text_response = (
-                f"Your next visit is {response['client_name']} at {response['address']}. "
-                f"This is visit {response['visit_number']} out of {response['total_visits']}. "
-                f"Note: {response['notes']}"
-            )
-        else:
-            text_response = response.get("message", "How else can I assist you with your sales planning today?")
-
-        # Yield message delta for text chunks (simulating streaming)
-        chunk_size = 20
-        for i in range(0, len(text_response), chunk_size):
-            text_chunk = text_response[i : i + chunk_size]
+        # The prebuilt events only lack the per-turn message ID
+        yield from tool_events
+        if not MockStream.streaming_enabled:
+            chunks = ("".join(chunks),)
+        for text_chunk in chunks:
             yield ("thread.message.delta", {"id": message_id, "delta": {"content": [{"text": {"value": text_chunk}}]}})
 
         # Finally yield a thread_run completion event
@@ -322,7 +420,11 @@ class MockAIProjectClient:
 
     def __init__(self):
         self.agents = MockAgentService()
-        self.connections = MagicMock()
+
+    @functools.cached_property
+    def connections(self):
+        """Connection service, created on first access."""
+        return MockConnectionService()
 
     @classmethod
     def from_connection_string(cls, credential, conn_str):
@@ -2,9 +2,79 @@
 Unit tests for chat_ui.py
 """
 
-from gradio import ChatMessage
+import asyncio
+import contextvars
+from types import SimpleNamespace
 
-from chat_ui import EventHandler, convert_chatmessage_to_dict, convert_dict_to_chatmessage, nullcontext
+from chat_ui import (
+    TOOL_FORMATTERS,
+    EventHandler,
+    _rec,
+    create_chat_interface,
+    format_generic_output,
+    nullcontext,
+)
+from tests.mock_services import MockAIProjectClient, MockStream
+
+
+def collect(chat, user_message, history):
+    """Drain the async chat generator and return every (history, textbox) pair it yielded."""
+
+    async def run():
+        return [output async for output in chat(user_message, history)]
+
+    return asyncio.run(run())
+
+
+def make_tool_call_events(call_id, func_name, output):
+    """Build minimal stand-ins for a tool call's RunStepDeltaChunk and completed RunStep."""
+    step_delta = SimpleNamespace(
+        delta=SimpleNamespace(
+            step_details=SimpleNamespace(
+                type="tool_calls",
+                tool_calls=[
+                    SimpleNamespace(id=call_id, type="function", function=SimpleNamespace(name=func_name, arguments="{}"))
+                ],
+            )
+        )
+    )
+    step = SimpleNamespace(
+        id="step-1",
+        type="tool_calls",
+        status="completed",
+        last_error=None,
+        step_details=SimpleNamespace(
+            tool_calls=[SimpleNamespace(id=call_id, type="function", function=SimpleNamespace(output=output))]
+        ),
+    )
+    return step_delta, step
+
+
+class ToolCallStream:
+    """Stream stand-in that drives the event handler through a single tool call."""
+
+    def __init__(self, event_handler, step_delta, step):
+        self.event_handler = event_handler
+        self.step_delta = step_delta
+        self.step = step
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excinfo):
+        return False
+
+    def __iter__(self):
+        self.event_handler.on_run_step_delta(self.step_delta)
+        yield ("thread.run.step.delta", {})
+        self.event_handler.on_run_step(self.step)
+        yield ("run_step", {})
+
+
+def make_message_delta(message_id, *texts):
+    """Build a minimal stand-in for a MessageDeltaChunk."""
+    content = [SimpleNamespace(text={"value": text}) for text in texts]
+    return SimpleNamespace(id=message_id, delta=SimpleNamespace(content=content))
 
 
 def test_nullcontext():
@@ -21,60 +91,245 @@ def test_nullcontext():
         assert result is None
 
 
-def test_convert_dict_to_chatmessage():
-    """Test converting dict to ChatMessage."""
-    # Test with basic fields
-    test_dict = {"role": "user", "content": "Hello, world!"}
-    result = convert_dict_to_chatmessage(test_dict)
-    assert isinstance(result, ChatMessage)
-    assert result.role == "user"
-    assert result.content == "Hello, world!"
-    assert result.metadata is None
-
-    # Test with metadata
-    test_dict_with_metadata = {
-        "role": "assistant",
-        "content": "I can help you with that.",
-        "metadata": {"source": "AI", "confidence": 0.95},
-    }
-    result = convert_dict_to_chatmessage(test_dict_with_metadata)
-    assert isinstance(result, ChatMessage)
-    assert result.role == "assistant"
-    assert result.content == "I can help you with that."
-    assert result.metadata == {"source": "AI", "confidence": 0.95}
-
-
-def test_convert_chatmessage_to_dict():
-    """Test converting ChatMessage to dict."""
-    # Test with basic fields
-    msg = ChatMessage(role="user", content="Hello, world!")
-    result = convert_chatmessage_to_dict(msg)
-    assert isinstance(result, dict)
-    assert result["role"] == "user"
-    assert result["content"] == "Hello, world!"
-    assert result["metadata"] == {}
-
-    # Test with metadata
-    metadata = {"source": "User", "timestamp": "2023-07-15T12:00:00Z"}
-    msg_with_metadata = ChatMessage(role="user", content="Testing", metadata=metadata)
-    result = convert_chatmessage_to_dict(msg_with_metadata)
-    assert result["role"] == "user"
-    assert result["content"] == "Testing"
-    assert result["metadata"] == metadata
-
-
 def test_event_handler_initialization():
     """Test EventHandler initialization."""
     # Test without tracer
     handler = EventHandler()
     assert handler._current_message_id is None
-    assert handler._accumulated_text == ""
+    assert handler._accumulated_chunks == []
     assert handler._current_tools == {}
     assert handler.conversation is None
-    assert handler.create_tool_bubble_fn is None
+    assert handler._tool_bubbles == {}
     assert handler.tracer is None
 
     # Test with tracer
     mock_tracer = object()  # Simple mock object
     handler_with_tracer = EventHandler(tracer=mock_tracer)
     assert handler_with_tracer.tracer is mock_tracer
+
+
+def test_event_handler_updates_message_in_place():
+    """Test that streamed deltas mutate the existing message dict instead of rebuilding it."""
+    handler = EventHandler()
+    handler.conversation = []
+
+    handler.on_message_delta(make_message_delta("msg-1", "Hello"))
+    first_msg = handler.conversation[0]
+    handler.on_message_delta(make_message_delta("msg-1", ", world"))
+    handler.flush_text()
+
+    assert len(handler.conversation) == 1
+    assert handler.conversation[0] is first_msg
+    assert first_msg == {"role": "assistant", "content": "Hello, world", "metadata": {}}
+
+
+def test_event_handler_snapshot_is_detached_from_live_conversation():
+    """Test that snapshot() flushes pending text and returns copies the reader thread won't modify later."""
+    handler = EventHandler()
+    handler.conversation = []
+    handler.on_message_delta(make_message_delta("msg-1", "Hello"))
+
+    snapshot = handler.snapshot()
+    handler.on_message_delta(make_message_delta("msg-1", ", world"))
+    handler.flush_text()
+
+    assert snapshot == [{"role": "assistant", "content": "Hello", "metadata": {}}]
+    assert handler.conversation[0]["content"] == "Hello, world"
+    assert handler.pending_chars == len(", world")
+
+
+def test_event_handler_snapshot_copies_only_changed_messages():
+    """Test that snapshot() reuses copies of untouched messages and copies the streaming one again."""
+    handler = EventHandler()
+    handler.conversation = [{"role": "user", "content": "Hi", "metadata": {}}]
+    handler.on_message_delta(make_message_delta("msg-1", "Hello"))
+
+    first = handler.snapshot()
+    handler.on_message_delta(make_message_delta("msg-1", ", world"))
+    second = handler.snapshot()
+
+    assert second[0] is first[0]
+    assert second[1] is not first[1]
+    assert first[1]["content"] == "Hello"
+    assert second[1]["content"] == "Hello, world"
+
+
+def test_azure_store_chat_coalesces_stream_yields():
+    """Test that message deltas are batched instead of yielding once per stream event."""
+    client = MockAIProjectClient()
+    agent = client.agents.create_agent(model="gpt-4o", name="test-agent", instructions="", toolset=None)
+    thread = client.agents.create_thread()
+    chat = create_chat_interface(client, agent, thread)
+
+    user_message = "Who are my clients today?"
+    client.agents.create_message(thread_id=thread.id, role="user", content=user_message)
+    stream_events = list(MockStream(thread.id, agent.id, None, client.agents))
+    client.agents.messages.clear()
+
+    outputs = collect(chat, user_message, [])
+
+    history, textbox = outputs[-1]
+    assert textbox == ""
+    assert history[0] == {"role": "user", "content": user_message, "metadata": {}}
+    assert len(outputs) < len(stream_events)
+
+
+def test_mock_stream_consolidates_text_when_streaming_disabled(unchunked_mock_stream):
+    """Test that MockStream sends the whole message text in one delta when streaming is off."""
+    client = MockAIProjectClient()
+    thread = client.agents.create_thread()
+    client.agents.create_message(thread_id=thread.id, role="user", content="Who are my clients today?")
+
+    deltas = [data for event, data in MockStream(thread.id, "agent-1", None, client.agents) if event == "thread.message.delta"]
+
+    assert len(deltas) == 1
+    assert deltas[0]["delta"]["content"][0]["text"]["value"].startswith("Here are your clients for today")
+
+
+def test_azure_store_chat_updates_tool_bubble_in_place():
+    """Test that a tool call's pending bubble is updated rather than duplicated when it completes."""
+    client = MockAIProjectClient()
+    agent = client.agents.create_agent(model="gpt-4o", name="test-agent", instructions="", toolset=None)
+    thread = client.agents.create_thread()
+    step_delta, step = make_tool_call_events("call-1", "get_clients_for_today", '{"message": "3 clients today"}')
+    client.agents.create_stream = lambda thread_id, assistant_id, event_handler: ToolCallStream(
+        event_handler, step_delta, step
+    )
+    chat = create_chat_interface(client, agent, thread)
+
+    history, _ = collect(chat, "Who are my clients today?", [])[-1]
+
+    bubbles = [m for m in history if m["metadata"].get("id") == "tool-call-1"]
+    assert len(bubbles) == 1
+    assert bubbles[0]["content"] == "3 clients today"
+    assert bubbles[0]["metadata"]["status"] == "done"
+    assert bubbles[0]["metadata"]["title"].startswith("✅")
+
+
+def test_tool_bubble_stays_in_its_turn_after_thread_swap():
+    """Test that a tool call finishing after a thread swap updates the old turn, not the fresh conversation."""
+    client = MockAIProjectClient()
+    agent = client.agents.create_agent(model="gpt-4o", name="test-agent", instructions="", toolset=None)
+    chat = create_chat_interface(client, agent, client.agents.create_thread())
+    step_delta, step = make_tool_call_events("call-1", "get_clients_for_today", '{"message": "3 clients today"}')
+
+    class SwappingStream(ToolCallStream):
+        def __iter__(self):
+            self.event_handler.on_run_step_delta(self.step_delta)
+            yield ("thread.run.step.delta", {})
+            chat.thread = client.agents.create_thread()
+            self.event_handler.on_run_step(self.step)
+            yield ("run_step", {})
+
+    client.agents.create_stream = lambda thread_id, assistant_id, event_handler: SwappingStream(
+        event_handler, step_delta, step
+    )
+
+    history, _ = collect(chat, "Who are my clients today?", [])[-1]
+
+    assert [m["metadata"].get("status") for m in history if m["metadata"].get("id") == "tool-call-1"] == ["done"]
+    assert chat._conversation_state == []
+
+
+def test_tool_calls_run_in_the_turn_context():
+    """Test that tool calls on the stream reader thread see context variables set by the caller."""
+    client = MockAIProjectClient()
+    agent = client.agents.create_agent(model="gpt-4o", name="test-agent", instructions="", toolset=None)
+    chat = create_chat_interface(client, agent, client.agents.create_thread())
+    rep = contextvars.ContextVar("rep", default=None)
+    seen = []
+
+    class RecordingStream(ToolCallStream):
+        def __iter__(self):
+            seen.append(rep.get())
+            yield ("run_step", {})
+
+    client.agents.create_stream = lambda thread_id, assistant_id, event_handler: RecordingStream(event_handler, None, None)
+
+    async def run():
+        rep.set("rep-1")
+        return [output async for output in chat("Plan my route", [])]
+
+    asyncio.run(run())
+
+    assert seen == ["rep-1"]
+
+
+def test_azure_store_chat_reports_stream_failure():
+    """Test that an error raised while reading the stream surfaces as an assistant message."""
+    client = MockAIProjectClient()
+    agent = client.agents.create_agent(model="gpt-4o", name="test-agent", instructions="", toolset=None)
+    thread = client.agents.create_thread()
+
+    class FailingStream(ToolCallStream):
+        def __iter__(self):
+            yield ("thread.run.step.delta", {})
+            raise ConnectionError("stream dropped")
+
+    client.agents.create_stream = lambda thread_id, assistant_id, event_handler: FailingStream(event_handler, None, None)
+    chat = create_chat_interface(client, agent, thread)
+
+    history, _ = collect(chat, "Plan my route", [])[-1]
+
+    assert history[-1]["role"] == "assistant"
+    assert "stream dropped" in history[-1]["content"]
+
+
+def test_chat_interface_thread_swap_starts_fresh_conversation(unchunked_mock_stream):
+    """Test that assigning a new thread starts a fresh conversation, streamed through a new event handler."""
+    client = MockAIProjectClient()
+    agent = client.agents.create_agent(model="gpt-4o", name="test-agent", instructions="", toolset=None)
+    chat = create_chat_interface(client, agent, client.agents.create_thread())
+    handlers = []
+    create_stream = client.agents.create_stream
+
+    def recording_create_stream(thread_id, assistant_id, event_handler):
+        handlers.append(event_handler)
+        return create_stream(thread_id, assistant_id, event_handler)
+
+    client.agents.create_stream = recording_create_stream
+    collect(chat, "Who are my clients today?", [])
+
+    new_thread = client.agents.create_thread()
+    chat.thread = new_thread
+    chat._last_message_sent_time = 0
+    history, _ = collect(chat, "Plan my route", [])[-1]
+
+    assert len(handlers) == 2 and handlers[0] is not handlers[1]
+    assert history[0] == {"role": "user", "content": "Plan my route", "metadata": {}}
+    assert client.agents.messages[new_thread.id][0]["content"] == "Plan my route"
+
+
+def test_tool_formatters():
+    """Test tool-specific formatters and their fall-through when fields are missing."""
+    stock = {"name": "Widget", "item_id": "W1", "stock": 7}
+    assert TOOL_FORMATTERS["check_item_stock"](stock) == "Widget (ID: W1): 7 units in stock."
+    assert TOOL_FORMATTERS["check_item_stock"]({"message": "n/a"}) is None
+    assert TOOL_FORMATTERS["get_items_needing_restock"]({"count": 0}) == "No items found needing restock."
+
+
+def test_format_generic_output():
+    """Test the fallback bubble text for tools without a dedicated formatter."""
+    assert format_generic_output({"message": "Done"}, "") == "Done"
+    assert format_generic_output({"error": "Boom"}, "") == "Error: Boom"
+    assert format_generic_output([1, 2], "[1, 2]") == "Completed. Output: [1, 2]"
+
+
+def test_event_handler_skips_empty_deltas():
+    """Test that deltas without text do not create empty assistant messages."""
+    handler = EventHandler()
+    handler.conversation = []
+
+    handler.on_message_delta(SimpleNamespace(id="msg-1", delta=SimpleNamespace(content=None)))
+    handler.on_message_delta(make_message_delta("msg-1", ""))
+
+    assert handler.conversation == []
+    assert handler.pending_chars == 0
+
+
+def test_rec():
+    """Test span recording detection for missing, non-recording and recording spans."""
+    assert _rec(None) is False
+    assert _rec(SimpleNamespace()) is False
+    assert _rec(SimpleNamespace(is_recording=lambda: False)) is False
+    assert _rec(SimpleNamespace(is_recording=lambda: True)) is True
@@ -2,39 +2,44 @@
 Unit tests for initialize.py
 """
 
-import os
-from unittest.mock import patch
+from unittest.mock import MagicMock
 
-import initilize
-
-
-def test_check_azure_maps_key_not_set(capsys):
-    """Test when Azure Maps API key is not set in environment."""
-    with patch.dict(os.environ, {"AZURE_MAPS_KEY": ""}, clear=True):
-        initilize.check_azure_maps_key()
-        captured = capsys.readouterr()
-        assert "WARNING: AZURE_MAPS_KEY environment variable not found" in captured.out
-        assert "This application requires an Azure Maps API key" in captured.out
+import pytest
 
-
-def test_check_azure_maps_key_set(capsys):
-    """Test when Azure Maps API key is set in environment."""
-    with patch.dict(os.environ, {"AZURE_MAPS_KEY": "test-key-value"}):
-        initilize.check_azure_maps_key()
-        captured = capsys.readouterr()
-        assert "Azure Maps API key found in environment variables" in captured.out
+import initilize
 
 
-def test_main_function(capsys):
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        (None, ["WARNING: AZURE_MAPS_KEY environment variable not found", "This application requires an Azure Maps API key"]),
+        ("test-key-value", ["Azure Maps API key found in environment variables"]),
+    ],
+)
+def test_check_azure_maps_key(capsys, monkeypatch, key, expected):
+    """Test the key check with the Azure Maps API key unset and set in the environment."""
+    if key is None:
+        monkeypatch.delenv("AZURE_MAPS_KEY", raising=False)
+    else:
+        monkeypatch.setenv("AZURE_MAPS_KEY", key)
+    initilize.check_azure_maps_key()
+    captured = capsys.readouterr()
+    for text in expected:
+        assert text in captured.out
+
+
+def test_main_function(capsys, monkeypatch):
     """Test the main function execution."""
-    with patch.dict(os.environ, {"AZURE_MAPS_KEY": "test-key-value"}):
-        with patch("initilize.load_dotenv") as mock_load_dotenv:
-            initilize.main()
+    monkeypatch.setenv("AZURE_MAPS_KEY", "test-key-value")
+    mock_load_dotenv = MagicMock()
+    monkeypatch.setattr(initilize, "load_dotenv", mock_load_dotenv)
+
+    initilize.main()
 
-            # Check if load_dotenv was called with override=True
-            mock_load_dotenv.assert_called_once_with(override=True)
+    # Check if load_dotenv was called with override=True
+    mock_load_dotenv.assert_called_once_with(override=True)
 
-            # Check output
-            captured = capsys.readouterr()
-            assert "Sales Day Planning Assistant - Initialization" in captured.out
-            assert "Initialization completed" in captured.out
+    # Check output
+    captured = capsys.readouterr()
+    assert "Sales Day Planning Assistant - Initialization" in captured.out
+    assert "Initialization completed" in captured.out
@@ -2,16 +2,14 @@
 Integration tests for sales_functions.py that run against real Azure Maps API when secrets are available.
 """
 
-import json
 import os
 
 import pytest
 
 import sales_functions
-from mock_api import SAMPLE_CLIENTS
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def has_azure_maps_key():
     """Check if a real Azure Maps API key is available."""
     api_key = os.environ.get("AZURE_MAPS_KEY")
@@ -21,19 +19,41 @@ def has_azure_maps_key():
     return api_key
 
 
+@pytest.fixture(scope="session")
+def todays_clients(has_azure_maps_key):
+    """Today's client list response and the sales day it started, loaded once per session."""
+    day = sales_functions.SalesDayState()
+    token = sales_functions.sales_day.set(day)
+    try:
+        return sales_functions._loads(sales_functions.get_clients_for_today()), day
+    finally:
+        sales_functions.sales_day.reset(token)
+
+
+@pytest.fixture(scope="module")
+def planned_route(todays_clients):
+    """Route for today's clients from a single real Azure Maps call, shared by the tests in this module."""
+    _, day = todays_clients
+    token = sales_functions.sales_day.set(day)
+    try:
+        return sales_functions._loads(sales_functions.plan_optimal_route())
+    finally:
+        sales_functions.sales_day.reset(token)
+
+
+@pytest.fixture
+def planned_day(todays_clients, planned_route):
+    """Run the test inside today's sales day, with the route already planned."""
+    _, day = todays_clients
+    token = sales_functions.sales_day.set(day)
+    yield day
+    sales_functions.sales_day.reset(token)
+
+
 @pytest.mark.integration
-def test_real_plan_optimal_route(has_azure_maps_key):
+def test_real_plan_optimal_route(planned_route):
     """Test plan_optimal_route using the real Azure Maps API."""
-    # Use the API key to avoid 'not accessed' warning
-    assert has_azure_maps_key is not None
-    # Reset global state
-    sales_functions.current_route = None
-    sales_functions.current_client_list = SAMPLE_CLIENTS[:2]  # Use 2 sample clients to avoid too many requests
-    sales_functions.current_visit_index = -1
-
-    # Call the function to test with real API
-    result = sales_functions.plan_optimal_route()
-    result_data = json.loads(result)
+    result_data = planned_route
 
     # Validate successful response
     assert "error" not in result_data
@@ -55,7 +75,7 @@ def test_real_generate_location_map_with_query(has_azure_maps_key):
     assert has_azure_maps_key is not None
     # Call function with a real location query
     result = sales_functions.generate_location_map(query="Zurich, Switzerland")
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate successful response
     assert "error" not in result_data
@@ -80,7 +100,7 @@ def test_real_generate_location_map_with_coordinates(has_azure_maps_key):
 
     # Call function with coordinates
     result = sales_functions.generate_location_map(lat=lat, lon=lon)
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate successful response
     assert "error" not in result_data
@@ -94,27 +114,21 @@ def test_real_generate_location_map_with_coordinates(has_azure_maps_key):
 
 
 @pytest.mark.integration
-def test_real_workflow_with_clients(has_azure_maps_key):
+def test_real_workflow_with_clients(todays_clients, planned_route, planned_day):
     """Test a complete workflow using real API calls."""
-    # Reset global state
-    sales_functions.reset_sales_day()
-
     # Step 1: Get today's clients
-    clients_result = sales_functions.get_clients_for_today()
-    clients_data = json.loads(clients_result)
+    clients_data, _ = todays_clients
     assert "error" not in clients_data
     assert "clients" in clients_data
     assert len(clients_data["clients"]) > 0
 
     # Step 2: Plan optimal route
-    route_result = sales_functions.plan_optimal_route()
-    route_data = json.loads(route_result)
-    assert "error" not in route_data
-    assert "routes" in route_data
+    assert "error" not in planned_route
+    assert "routes" in planned_route
 
     # Step 3: Get first client visit
     visit_result = sales_functions.get_next_visit()
-    visit_data = json.loads(visit_result)
+    visit_data = sales_functions._loads(visit_result)
     assert "error" not in visit_data
     assert "client_name" in visit_data
     assert "status" in visit_data
@@ -122,18 +136,18 @@ def test_real_workflow_with_clients(has_azure_maps_key):
 
     # Step 4: Check status
     status_result = sales_functions.get_current_visit_status()
-    status_data = json.loads(status_result)
+    status_data = sales_functions._loads(status_result)
     assert "error" not in status_data
     assert status_data["status"] == "in_progress"
     assert "client_name" in status_data
 
     # Step 5: Get map for current location
     map_result = sales_functions.generate_location_map()
-    map_data = json.loads(map_result)
+    map_data = sales_functions._loads(map_result)
     assert "error" not in map_data
     assert "map_url" in map_data
 
     # Step 6: Reset at the end
     reset_result = sales_functions.reset_sales_day()
-    reset_data = json.loads(reset_result)
+    reset_data = sales_functions._loads(reset_result)
     assert reset_data["status"] == "success"
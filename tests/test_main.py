@@ -5,9 +5,15 @@ Note: These tests focus on standalone functions in main.py that can be tested
 without initializing the full application.
 """
 
-from unittest.mock import MagicMock
+import importlib
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
 import pytest
+from azure.ai.projects.models import FunctionTool, ToolSet
+
+from tests.mock_services import MockAIProjectClient
 
 
 @pytest.mark.xfail
@@ -75,3 +81,87 @@ def test_clear_history_isolated():
 
     # Verify span was created with thread ID
     mock_span.set_attribute.assert_called_once_with("new_thread_id", mock_new_thread.id)
+
+
+@pytest.fixture(scope="module")
+def main_module():
+    """Import main.py with a mocked project client."""
+    with patch("azure.ai.projects.AIProjectClient.from_connection_string", return_value=MockAIProjectClient()):
+        return importlib.import_module("main")
+
+
+@pytest.fixture
+def agent_toolset(main_module):
+    """Return the agent's function toolset and a remote agent definition that matches it."""
+    toolset = ToolSet()
+    toolset.add(FunctionTool(main_module.AGENT_FUNCTIONS))
+    remote_agent = SimpleNamespace(
+        id="agent-1", model="gpt-4o", instructions=main_module.AGENT_INSTRUCTIONS, tools=list(reversed(toolset.definitions))
+    )
+    return toolset, remote_agent
+
+
+def test_agent_matches_ignores_tool_order(main_module, agent_toolset):
+    """Test that an unchanged remote agent matches even when the service reorders its tools."""
+    toolset, remote_agent = agent_toolset
+
+    assert main_module._agent_matches(remote_agent, "gpt-4o", toolset) is True
+
+
+def test_agent_matches_detects_changed_definition(main_module, agent_toolset):
+    """Test that a different model, instructions or tool list on the remote agent requires an update."""
+    toolset, remote_agent = agent_toolset
+
+    assert main_module._agent_matches(remote_agent, "gpt-4o-mini", toolset) is False
+    assert (
+        main_module._agent_matches(SimpleNamespace(**{**vars(remote_agent), "instructions": "old"}), "gpt-4o", toolset)
+        is False
+    )
+    assert main_module._agent_matches(SimpleNamespace(**{**vars(remote_agent), "tools": []}), "gpt-4o", toolset) is False
+
+
+def test_bootstrap_reuse_registers_toolset_through_update_agent(main_module, agent_toolset, monkeypatch):
+    """Test that reusing an unchanged agent still sends its toolset through update_agent for streamed tool calls."""
+    _, remote_agent = agent_toolset
+    remote_agent.model, remote_agent.name = main_module.CFG.model, main_module.AGENT_NAME
+    client = MagicMock()
+    client.agents.update_agent.return_value = remote_agent
+    monkeypatch.setattr(main_module, "project_client", client)
+    monkeypatch.setattr(main_module, "_connect_bing", lambda: None)
+    monkeypatch.setattr(main_module, "_find_agent", lambda: remote_agent)
+    monkeypatch.setattr(main_module, "_create_thread", lambda: SimpleNamespace(id="thread-1"))
+    monkeypatch.setattr(main_module, "_remember_agent", lambda agent_id: None)
+    monkeypatch.setattr(main_module, "_replenish_spare_threads", lambda: None)
+
+    agent, first_thread = main_module._bootstrap.__wrapped__()
+
+    assert agent is remote_agent and first_thread.id == "thread-1"
+    client.agents.create_agent.assert_not_called()
+    client.agents.update_agent.assert_called_once()
+    kwargs = client.agents.update_agent.call_args.kwargs
+    assert kwargs["assistant_id"] == "agent-1"
+    assert sorted(kwargs) == ["assistant_id", "toolset"]
+
+
+def test_process_route_data_builds_map_traces(main_module, tmp_path):
+    """Test that a dumped route becomes a line trace plus one marker trace per instruction type."""
+    point = {"latitude": 47.37, "longitude": 8.54}
+    route = {
+        "guidance": {
+            "instructions": [
+                {"point": point, "instructionType": "LOCATION_DEPARTURE", "street": "Bahnhofstrasse"},
+                {"point": point, "instructionType": "TURN", "message": "Turn left"},
+                {"point": point, "instructionType": "TURN"},
+            ],
+            "instructionGroups": [{"groupMessage": "Leave the office"}],
+        }
+    }
+    route_file = tmp_path / "route_response.json"
+    route_file.write_text(json.dumps({"routes": [route]}))
+
+    fig, nav_sections = main_module.process_route_data(route_file)
+
+    assert [trace.name for trace in fig.data] == ["Route", "LOCATION_DEPARTURE", "TURN"]
+    assert fig.data[2].marker.color == "orange"
+    assert len(fig.data[2].lat) == 2
+    assert nav_sections == [["Section 1", "Leave the office"]]
@@ -2,7 +2,8 @@
 Unit tests for mock_api.py
 """
 
-from datetime import datetime
+import random
+from datetime import date
 
 from mock_api import SAMPLE_CLIENTS, get_client_details, get_todays_clients
 
@@ -19,7 +20,7 @@ def test_get_todays_clients():
     assert "clients" in result
 
     # Validate date format (YYYY-MM-DD)
-    assert datetime.strptime(result["date"], "%Y-%m-%d")
+    assert date.fromisoformat(result["date"]).isoformat() == result["date"]
 
     # Validate office data
     assert result["office"]["name"] == "Office"
@@ -45,6 +46,15 @@ def test_get_todays_clients():
         assert "priority" in client
 
 
+def test_get_todays_clients_is_stable_within_a_day():
+    """Test that repeated calls on the same day return the same client selection."""
+    first = get_todays_clients(count=3)
+    second = get_todays_clients(count=3)
+
+    assert [c["id"] for c in first["clients"]] == [c["id"] for c in second["clients"]]
+    assert first["clients"] is not second["clients"]
+
+
 def test_get_client_details_existing():
     """Test get_client_details with an existing client ID."""
     # Get a known client ID
@@ -72,7 +82,7 @@ def test_get_client_details_existing():
     assert "notes" in result
 
     # Validate last_visit format
-    assert datetime.strptime(result["last_visit"], "%Y-%m-%d")
+    assert date.fromisoformat(result["last_visit"]).isoformat() == result["last_visit"]
 
     # Validate numeric fields
     assert isinstance(result["total_purchases"], float)
@@ -95,3 +105,13 @@ def test_get_client_details_nonexistent():
     assert "error" in result
     assert client_id in result["error"]
     assert "not found" in result["error"]
+
+
+def test_get_client_details_uses_given_rng():
+    """Test that a seeded generator makes the simulated details reproducible."""
+    client_id = SAMPLE_CLIENTS[0]["id"]
+
+    first = get_client_details(client_id, rng=random.Random(7))
+    second = get_client_details(client_id, rng=random.Random(7))
+
+    assert first == second
@@ -2,35 +2,30 @@
 Unit tests for sales_functions.py
 """
 
-import json
+import contextvars
+import itertools
+from collections import OrderedDict
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 import sales_functions
 from mock_api import OFFICE_LOCATION, SAMPLE_CLIENTS
-
-
-class MockResponse:
-    """Mock class for requests.Response."""
-
-    def __init__(self, json_data, status_code=200):
-        self.json_data = json_data
-        self.status_code = status_code
-        self.text = json.dumps(json_data)
-
-    def json(self):
-        return self.json_data
+from tests.mock_services import MockResponse
 
 
 @pytest.fixture
-def reset_globals():
-    """Reset the global variables in sales_functions before each test."""
-    sales_functions.current_route = None
-    sales_functions.current_client_list = None
-    sales_functions.current_visit_index = -1
-    sales_functions.map_cache = {}
+def reset_globals(monkeypatch, tmp_path):
+    """Give each test a fresh sales day, empty caches and a temporary route dump in sales_functions, restored afterwards."""
+    token = sales_functions.sales_day.set(sales_functions.SalesDayState())
+    monkeypatch.setattr(sales_functions, "map_cache", {})
+    monkeypatch.setattr(sales_functions, "_route_cache", OrderedDict())
+    monkeypatch.setattr(sales_functions, "_geocode_cache", OrderedDict())
+    monkeypatch.setattr(sales_functions, "ROUTE_DUMP_PATH", str(tmp_path / "route_response.json"))
     yield
+    # Let queued route dumps finish before the real dump path is restored
+    sales_functions._route_dump_executor.submit(lambda: None).result()
+    sales_functions.sales_day.reset(token)
 
 
 def test_get_azure_maps_key(mock_env_azure_maps_key):
@@ -62,6 +57,49 @@ def test_format_coordinates_for_azure_maps():
     assert result == expected
 
 
+def test_nearest_neighbor_order():
+    """Test that clients are ordered by always visiting the closest remaining one."""
+    office = OFFICE_LOCATION["coordinates"]
+
+    def client_at(dlat):
+        return {"coordinates": {"latitude": office["latitude"] + dlat, "longitude": office["longitude"]}}
+
+    clients = [client_at(0.3), client_at(-0.05), client_at(0.1)]
+    assert sales_functions._nearest_neighbor_order(clients) == [1, 2, 0]
+    assert sales_functions._nearest_neighbor_order([]) == []
+
+
+def test_distance_matrix_matches_haversine():
+    """Test that the vectorized distance matrix agrees with the scalar haversine distance."""
+    places = [OFFICE_LOCATION, *SAMPLE_CLIENTS]
+    dist = sales_functions._distance_matrix(places)
+    for i, a in enumerate(places):
+        for j, b in enumerate(places):
+            expected = sales_functions._haversine_km(
+                a["coordinates"]["latitude"],
+                a["coordinates"]["longitude"],
+                b["coordinates"]["latitude"],
+                b["coordinates"]["longitude"],
+            )
+            assert dist[i][j] == pytest.approx(expected, abs=1e-9)
+
+
+def test_held_karp_matches_brute_force():
+    """Test that Held-Karp finds the same tour length as trying every permutation."""
+    offsets = [(0.12, -0.03), (-0.07, 0.2), (0.05, 0.05), (-0.15, -0.1), (0.2, 0.15), (0.01, -0.22)]
+    places = [{"coordinates": {"latitude": 47.0 + dlat, "longitude": 8.5 + dlon}} for dlat, dlon in [(0.0, 0.0), *offsets]]
+    dist = sales_functions._distance_matrix(places)
+
+    def tour_length(order):
+        stops = [0, *order, 0]
+        return sum(dist[a][b] for a, b in zip(stops, stops[1:]))
+
+    order = sales_functions._held_karp(dist)
+    assert sorted(order) == list(range(1, 7))
+    assert tour_length(order) == pytest.approx(min(tour_length(p) for p in itertools.permutations(range(1, 7))))
+    assert sales_functions._held_karp([[0.0]]) == []
+
+
 @patch("sales_functions.get_todays_clients")
 def test_get_clients_for_today_success(mock_get_todays_clients, reset_globals):
     """Test get_clients_for_today with successful response."""
@@ -71,7 +109,7 @@ def test_get_clients_for_today_success(mock_get_todays_clients, reset_globals):
 
     # Call the function
     result = sales_functions.get_clients_for_today()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate result
     assert "date" in result_data
@@ -90,8 +128,8 @@ def test_get_clients_for_today_success(mock_get_todays_clients, reset_globals):
         assert "priority" in client
 
     # Check that global state is updated
-    assert sales_functions.current_client_list == SAMPLE_CLIENTS[:2]
-    assert sales_functions.current_visit_index == -1
+    assert sales_functions.sales_day.get().clients == SAMPLE_CLIENTS[:2]
+    assert sales_functions.sales_day.get().index == -1
 
 
 @patch("sales_functions.get_todays_clients")
@@ -102,7 +140,7 @@ def test_get_clients_for_today_error(mock_get_todays_clients, reset_globals):
 
     # Call the function
     result = sales_functions.get_clients_for_today()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate error response
     assert "error" in result_data
@@ -110,15 +148,15 @@ def test_get_clients_for_today_error(mock_get_todays_clients, reset_globals):
 
 
 @patch("sales_functions.get_clients_for_today")
-@patch("requests.get")
+@patch("sales_functions._session.get")
 @patch("sales_functions.get_azure_maps_key")
 def test_plan_optimal_route_success(mock_get_key, mock_requests_get, mock_get_clients, reset_globals):
     """Test plan_optimal_route with successful API response."""
     # Setup mocks
     mock_get_key.return_value = "test_key"
 
-    # Set up current_client_list
-    sales_functions.current_client_list = SAMPLE_CLIENTS[:2]
+    # Set up today's clients
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
 
     # Mock successful Azure Maps API response
     mock_api_response = {
@@ -144,7 +182,7 @@ def test_plan_optimal_route_success(mock_get_key, mock_requests_get, mock_get_cl
 
     # Call the function
     result = sales_functions.plan_optimal_route()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate response
     assert "routes" in result_data
@@ -152,27 +190,102 @@ def test_plan_optimal_route_success(mock_get_key, mock_requests_get, mock_get_cl
     assert "legs" in result_data["routes"][0]
     assert len(result_data["routes"][0]["legs"]) == 2
 
-    # Verify points were cleaned up
+    # Verify points were cleaned up and not requested in the first place
     for leg in result_data["routes"][0]["legs"]:
         assert "points" not in leg
+    assert mock_requests_get.call_args.kwargs["params"]["routeRepresentation"] == "summaryOnly"
+
+
+@patch("sales_functions._session.get")
+@patch("sales_functions.get_azure_maps_key")
+def test_plan_optimal_route_reuses_cached_route(mock_get_key, mock_session_get, reset_globals):
+    """Test that replanning the same clients is served from the route cache until the day is reset."""
+    mock_get_key.return_value = "test_key"
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
+    mock_session_get.return_value = MockResponse({"routes": [{"legs": [{"points": []}]}]})
 
+    first = sales_functions.plan_optimal_route()
+    second = sales_functions.plan_optimal_route()
+    assert first == second
+    assert mock_session_get.call_count == 1
 
-@patch("requests.get")
+    sales_functions.reset_sales_day()
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
+    sales_functions.plan_optimal_route()
+    assert mock_session_get.call_count == 2
+
+
+@patch("sales_functions._session.get")
+@patch("sales_functions.get_azure_maps_key")
+def test_plan_optimal_route_dumps_route_in_background(mock_get_key, mock_session_get, reset_globals, tmp_path):
+    """Test that the planned route is written to the dump file by the background worker."""
+    dump_path = tmp_path / "route_response.json"
+    mock_get_key.return_value = "test_key"
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
+    mock_session_get.return_value = MockResponse({"routes": [{"legs": [{"points": []}]}]})
+
+    sales_functions.plan_optimal_route()
+    # Queue a no-op behind the dump so it has finished once this returns
+    sales_functions._route_dump_executor.submit(lambda: None).result()
+
+    assert sales_functions._loads(dump_path.read_text()) == {"routes": [{"legs": [{}]}]}
+    assert not (tmp_path / "route_response.json.tmp").exists()
+
+
+@patch("sales_functions._session.get")
+@patch("sales_functions.get_azure_maps_key")
+def test_plan_optimal_route_orders_visits_locally(mock_get_key, mock_session_get, reset_globals):
+    """Test that a normal day's visit order is solved locally and Azure Maps only computes directions."""
+    mock_get_key.return_value = "test_key"
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:4]
+    mock_session_get.return_value = MockResponse({"routes": [{"legs": []}]})
+
+    sales_functions.plan_optimal_route()
+    ordered = sales_functions.sales_day.get().clients
+
+    params = mock_session_get.call_args.kwargs["params"]
+    assert params["computeBestOrder"] == "false"
+    assert params["query"] == sales_functions.format_coordinates_for_azure_maps(ordered)
+    assert sorted(c["id"] for c in ordered) == sorted(c["id"] for c in SAMPLE_CLIENTS[:4])
+
+    # Replanning the same clients in any order keeps the visit order and hits the cache
+    sales_functions.sales_day.get().clients = list(reversed(ordered))
+    sales_functions.plan_optimal_route()
+    assert sales_functions.sales_day.get().clients == ordered
+    assert mock_session_get.call_count == 1
+
+
+@patch("sales_functions.time.sleep")
+@patch("sales_functions._session.get")
+def test_get_retries_throttled_requests(mock_session_get, mock_sleep):
+    """Test that throttling and server errors are retried with backoff and other statuses are not."""
+    mock_session_get.side_effect = [MockResponse({}, 429), MockResponse({}, 503), MockResponse({"ok": True})]
+    assert sales_functions._get("https://example.test", {}).json() == {"ok": True}
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [0.2, 0.4]
+
+    mock_session_get.side_effect = [MockResponse({}, 400)]
+    assert sales_functions._get("https://example.test", {}).status_code == 400
+
+    mock_session_get.side_effect = [MockResponse({}, 500)] * 4
+    assert sales_functions._get("https://example.test", {}).status_code == 500
+
+
+@patch("sales_functions._session.get")
 @patch("sales_functions.get_azure_maps_key")
 def test_plan_optimal_route_api_error(mock_get_key, mock_requests_get, reset_globals):
     """Test plan_optimal_route with API error."""
     # Setup mocks
     mock_get_key.return_value = "test_key"
 
-    # Set up current_client_list
-    sales_functions.current_client_list = SAMPLE_CLIENTS[:2]
+    # Set up today's clients
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
 
     # Mock API error response
     mock_requests_get.return_value = MockResponse({"error": {"code": "400", "message": "Invalid parameter"}}, 400)
 
     # Call the function
     result = sales_functions.plan_optimal_route()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate error response
     assert "error" in result_data
@@ -182,8 +295,8 @@ def test_plan_optimal_route_api_error(mock_get_key, mock_requests_get, reset_glo
 def test_get_next_visit(mock_get_client_details, reset_globals):
     """Test get_next_visit function."""
     # Setup
-    sales_functions.current_client_list = SAMPLE_CLIENTS[:3]
-    sales_functions.current_visit_index = -1
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:3]
+    sales_functions.sales_day.get().index = -1
 
     # Mock client details
     mock_client_details = {**SAMPLE_CLIENTS[0], "last_visit": "2023-06-15", "notes": "Interested in new product line"}
@@ -191,7 +304,7 @@ def test_get_next_visit(mock_get_client_details, reset_globals):
 
     # Test first visit
     result = sales_functions.get_next_visit()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate
     assert result_data["visit_number"] == 1
@@ -203,18 +316,36 @@ def test_get_next_visit(mock_get_client_details, reset_globals):
     assert result_data["status"] == "in_progress"
 
     # Check that index was incremented
-    assert sales_functions.current_visit_index == 0
+    assert sales_functions.sales_day.get().index == 0
+
+
+@patch("sales_functions.get_client_details")
+@patch("sales_functions._session.get")
+@patch("sales_functions.get_azure_maps_key")
+def test_get_next_visit_uses_details_loaded_with_route(mock_get_key, mock_session_get, mock_get_client_details, reset_globals):
+    """Test that client details are fetched once when the route is planned, not on every visit."""
+    mock_get_key.return_value = "test_key"
+    mock_session_get.return_value = MockResponse({"routes": [{"legs": []}]})
+    mock_get_client_details.side_effect = lambda client_id: {"last_visit": "2023-06-15", "notes": f"Notes for {client_id}"}
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:3]
+
+    sales_functions.plan_optimal_route()
+    assert mock_get_client_details.call_count == 3
+
+    visits = [sales_functions._loads(sales_functions.get_next_visit()) for _ in range(3)]
+    assert mock_get_client_details.call_count == 3
+    assert [v["notes"] for v in visits] == [f"Notes for {v['client_id']}" for v in visits]
 
 
 def test_get_next_visit_completed(reset_globals):
     """Test get_next_visit when all visits are completed."""
     # Setup - all visits completed
-    sales_functions.current_client_list = SAMPLE_CLIENTS[:2]
-    sales_functions.current_visit_index = 2  # Past the end of the list
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
+    sales_functions.sales_day.get().index = 2  # Past the end of the list
 
     # Call function
     result = sales_functions.get_next_visit()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate completion message
     assert "message" in result_data
@@ -223,45 +354,38 @@ def test_get_next_visit_completed(reset_globals):
     assert result_data["status"] == "completed"
 
 
-def test_get_current_visit_status(reset_globals):
-    """Test get_current_visit_status in different states."""
-    # Test 1: Not started
-    sales_functions.current_client_list = SAMPLE_CLIENTS[:3]
-    sales_functions.current_visit_index = -1
-
-    result = sales_functions.get_current_visit_status()
-    result_data = json.loads(result)
-
-    assert result_data["message"].startswith("Sales day not yet started")
-    assert result_data["status"] == "not_started"
-    assert result_data["location"] == "Office"
-
-    # Test 2: In progress
-    sales_functions.current_visit_index = 1  # Second client
-
-    result = sales_functions.get_current_visit_status()
-    result_data = json.loads(result)
-
-    assert "message" in result_data
-    assert result_data["visit_number"] == 2
-    assert result_data["total_visits"] == 3
-    assert result_data["remaining_visits"] == 1
-    assert result_data["client_id"] == SAMPLE_CLIENTS[1]["id"]
-    assert result_data["status"] == "in_progress"
-
-    # Test 3: Completed
-    sales_functions.current_visit_index = 3  # Past end of list
-
-    result = sales_functions.get_current_visit_status()
-    result_data = json.loads(result)
-
-    assert result_data["message"].startswith("All client visits completed")
-    assert result_data["status"] == "completed"
-    assert "summary" in result_data
-    assert result_data["summary"]["total_visits"] == 3
-
-
-@patch("requests.get")
+@pytest.mark.parametrize(
+    "visit_index, expected_status, expected_prefix, expected_fields",
+    [
+        (-1, "not_started", "Sales day not yet started", {"location": "Office"}),
+        (
+            1,
+            "in_progress",
+            "",
+            {"visit_number": 2, "total_visits": 3, "remaining_visits": 1, "client_id": SAMPLE_CLIENTS[1]["id"]},
+        ),
+        (
+            3,
+            "completed",
+            "All client visits completed",
+            {"summary": {"total_visits": 3, "clients_visited": [client["name"] for client in SAMPLE_CLIENTS[:3]]}},
+        ),
+    ],
+)
+def test_get_current_visit_status(reset_globals, visit_index, expected_status, expected_prefix, expected_fields):
+    """Test get_current_visit_status before, during and after the day's visits."""
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:3]
+    sales_functions.sales_day.get().index = visit_index
+
+    result_data = sales_functions._loads(sales_functions.get_current_visit_status())
+
+    assert result_data["status"] == expected_status
+    assert result_data["message"].startswith(expected_prefix)
+    for key, value in expected_fields.items():
+        assert result_data[key] == value
+
+
+@patch("sales_functions._session.get")
 @patch("sales_functions.get_azure_maps_key")
 def test_generate_location_map_with_query(mock_get_key, mock_requests_get, reset_globals):
     """Test generate_location_map with query parameter."""
@@ -274,7 +398,7 @@ def test_generate_location_map_with_query(mock_get_key, mock_requests_get, reset
 
     # Call function with query
     result = sales_functions.generate_location_map(query="Zurich, Switzerland")
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate result
     assert "location_name" in result_data
@@ -287,8 +411,54 @@ def test_generate_location_map_with_query(mock_get_key, mock_requests_get, reset
     assert result_data["_chat_display"]["type"] == "image"
 
 
+@patch("sales_functions._session.get")
+@patch("sales_functions.get_azure_maps_key")
+def test_generate_location_map_caches_geocoding(mock_get_key, mock_session_get, reset_globals):
+    """Test that equivalent queries reuse the first geocoding result."""
+    mock_get_key.return_value = "test_key"
+    mock_session_get.return_value = MockResponse({"results": [{"position": {"lat": 47.3698, "lon": 8.5392}}]})
+
+    first = sales_functions._loads(sales_functions.generate_location_map(query="Zurich, Switzerland"))
+    second = sales_functions._loads(sales_functions.generate_location_map(query="  zurich,   SWITZERLAND "))
+
+    assert mock_session_get.call_count == 1
+    assert first["coordinates"] == second["coordinates"]
+
+
+@patch("sales_functions._session.get")
+@patch("sales_functions.get_azure_maps_key")
+def test_prefetch_day_plans_route(mock_get_key, mock_session_get, reset_globals):
+    """Test that prefetch_day plans today's route in the background without geocoding the known office."""
+    mock_get_key.return_value = "test_key"
+    mock_session_get.return_value = MockResponse({"routes": [{"legs": []}]})
+
+    route = sales_functions.prefetch_day().result()
+
+    assert route == {"routes": [{"legs": []}]}
+    assert sales_functions.sales_day.get().route is route
+    assert mock_session_get.call_count == 1
+    assert "route/directions" in mock_session_get.call_args.args[0]
+
+
+@pytest.mark.parametrize("lat, lon", [(True, 8.5), ("north", 8.5), (float("nan"), 8.5), (47.3, float("inf"))])
+@patch("sales_functions.get_azure_maps_key")
+def test_generate_location_map_rejects_invalid_coordinates(mock_get_key, lat, lon, reset_globals):
+    """Test that booleans, non-numeric strings and non-finite values are rejected as coordinates."""
+    mock_get_key.return_value = "test_key"
+    result = sales_functions._loads(sales_functions.generate_location_map(lat=lat, lon=lon))
+    assert result == {"error": "Invalid coordinates provided"}
+
+
+@patch("sales_functions.get_azure_maps_key")
+def test_generate_location_map_accepts_numeric_strings(mock_get_key, reset_globals):
+    """Test that coordinates passed as numeric strings are converted to floats."""
+    mock_get_key.return_value = "test_key"
+    result = sales_functions._loads(sales_functions.generate_location_map(lat="47.3698", lon="8.5392"))
+    assert result["coordinates"] == {"latitude": 47.3698, "longitude": 8.5392}
+
+
 @patch("sales_functions.get_azure_maps_key")
-@patch("requests.get")
+@patch("sales_functions._session.get")
 def test_generate_location_map_with_coordinates(mock_requests_get, mock_get_key, reset_globals):
     """Test generate_location_map with latitude and longitude parameters."""
     # Setup mocks
@@ -303,7 +473,7 @@ def test_generate_location_map_with_coordinates(mock_requests_get, mock_get_key,
 
     # Call function with coordinates
     result = sales_functions.generate_location_map(lat=lat, lon=lon)
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate result
     assert "coordinates" in result_data
@@ -315,7 +485,7 @@ def test_generate_location_map_with_coordinates(mock_requests_get, mock_get_key,
 
 
 @patch("sales_functions.get_azure_maps_key")
-@patch("requests.get")
+@patch("sales_functions._session.get")
 def test_generate_location_map_api_error(mock_requests_get, mock_get_key, reset_globals):
     """Test generate_location_map with API error response."""
     # Setup mocks
@@ -326,7 +496,7 @@ def test_generate_location_map_api_error(mock_requests_get, mock_get_key, reset_
 
     # Call function with query
     result = sales_functions.generate_location_map(query="Invalid Location")
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate error response
     assert "error" in result_data
@@ -335,42 +505,87 @@ def test_generate_location_map_api_error(mock_requests_get, mock_get_key, reset_
 def test_get_next_visit_no_clients(reset_globals):
     """Test get_next_visit when no clients are available."""
     # Ensure no clients are set
-    sales_functions.current_client_list = None
-    sales_functions.current_visit_index = -1
+    sales_functions.sales_day.get().clients = None
+    sales_functions.sales_day.get().index = -1
 
-    # Mock plan_optimal_route to return an error
-    with patch.object(sales_functions, "plan_optimal_route") as mock_plan:
-        mock_plan.return_value = json.dumps({"error": "No clients available"})
+    # Mock route planning to return an error
+    with patch.object(sales_functions, "_plan_optimal_route_impl") as mock_plan:
+        mock_plan.return_value = {"error": "No clients available"}
 
         # Call function
         result = sales_functions.get_next_visit()
-        result_data = json.loads(result)
+        result_data = sales_functions._loads(result)
 
         # Validate error is passed through
         assert "error" in result_data
         assert "No clients available" in result_data["error"]
 
-        # Verify plan_optimal_route was called
+        # Verify route planning was called
         mock_plan.assert_called_once()
 
 
 def test_reset_sales_day(reset_globals):
     """Test reset_sales_day function."""
     # Setup some state
-    sales_functions.current_route = {"some": "route"}
-    sales_functions.current_client_list = SAMPLE_CLIENTS
-    sales_functions.current_visit_index = 2
+    sales_functions.sales_day.get().route = {"some": "route"}
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS
+    sales_functions.sales_day.get().index = 2
 
     # Call reset
     result = sales_functions.reset_sales_day()
-    result_data = json.loads(result)
+    result_data = sales_functions._loads(result)
 
     # Validate response
     assert "message" in result_data
     assert "reset" in result_data["message"]
     assert result_data["status"] == "success"
 
-    # Check globals were reset
-    assert sales_functions.current_route is None
-    assert sales_functions.current_client_list is None
-    assert sales_functions.current_visit_index == -1
+    # Check the day was reset
+    assert sales_functions.sales_day.get().route is None
+    assert sales_functions.sales_day.get().clients is None
+    assert sales_functions.sales_day.get().index == -1
+
+
+def test_sales_day_is_per_context(reset_globals):
+    """Test that a sales day set in another context leaves the current day alone."""
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
+    sales_functions.sales_day.get().index = 1
+
+    def other_rep():
+        sales_functions.sales_day.set(sales_functions.SalesDayState(clients=SAMPLE_CLIENTS[:1], index=0))
+        sales_functions.reset_sales_day()
+        return sales_functions.sales_day.get()
+
+    other_day = contextvars.copy_context().run(other_rep)
+
+    assert other_day.clients is None
+    assert sales_functions.sales_day.get().clients == SAMPLE_CLIENTS[:2]
+    assert sales_functions.sales_day.get().index == 1
+
+
+def test_current_sales_day_starts_a_day_per_context():
+    """Test that contexts without a sales day each get their own instead of sharing one."""
+
+    def fresh_day():
+        assert sales_functions.sales_day.get() is None
+        day = sales_functions.current_sales_day()
+        assert sales_functions.current_sales_day() is day
+        return day
+
+    first = contextvars.Context().run(fresh_day)
+    second = contextvars.Context().run(fresh_day)
+
+    assert first is not second
+
+
+def test_reset_sales_day_keeps_other_days_routes(reset_globals):
+    """Test that resetting a day drops only that day's cached route."""
+    own_key = sales_functions._route_cache_key(SAMPLE_CLIENTS[:2])
+    other_key = sales_functions._route_cache_key(SAMPLE_CLIENTS[2:4])
+    sales_functions._route_cache[own_key] = ({"own": "route"}, "{}")
+    sales_functions._route_cache[other_key] = ({"other": "route"}, "{}")
+    sales_functions.sales_day.get().clients = SAMPLE_CLIENTS[:2]
+
+    sales_functions.reset_sales_day()
+
+    assert list(sales_functions._route_cache) == [other_key]
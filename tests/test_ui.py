@@ -5,30 +5,14 @@ These tests use mocked services for Azure AI Projects to ensure
 no real API calls are made during testing.
 """
 
-import json
+import importlib
 import os
-import signal
-import subprocess
-import time
 from unittest.mock import patch
 
 import pytest
 from playwright.sync_api import Page, expect
 
-from tests.mock_services import MockAIProjectClient
-
-
-class MockResponse:
-    """Mock HTTP response for requests.get mocked calls."""
-
-    def __init__(self, status_code=200, json_data=None):
-        self.status_code = status_code
-        self.json_data = json_data or {}
-        self.text = json.dumps(self.json_data)
-
-    def json(self):
-        """Return JSON data from the mock response."""
-        return self.json_data
+from tests.mock_services import MockAIProjectClient, MockResponse
 
 
 def mock_azure_maps_route_response(*args, **kwargs):
@@ -72,17 +56,27 @@ def mock_azure_maps_geocode_response(*args, **kwargs):
     )
 
 
+def mock_azure_maps_static_map_response(*args, **kwargs):
+    """Generate a mock response for the Azure Maps static map API."""
+    # For static map images, just return a success response with a mock URL
+    return MockResponse(json_data={"map_url": "https://mock.azure.maps.com/static-map.png"})
+
+
+# Azure Maps endpoint path and the mock that answers it
+MOCK_RESPONSES_BY_PATH = (
+    ("route/directions", mock_azure_maps_route_response),
+    ("search/address", mock_azure_maps_geocode_response),
+    ("map/static", mock_azure_maps_static_map_response),
+)
+
+
 def mock_requests_get(*args, **kwargs):
-    """Mock all requests.get calls based on the URL."""
+    """Mock all Azure Maps GET calls based on the URL."""
     url = args[0] if args else kwargs.get("url", "")
 
-    if "route/directions" in url:
-        return mock_azure_maps_route_response(*args, **kwargs)
-    elif "search/address" in url:
-        return mock_azure_maps_geocode_response(*args, **kwargs)
-    elif "map/static" in url:
-        # For static map images, just return a success response with a mock URL
-        return MockResponse(json_data={"map_url": "https://mock.azure.maps.com/static-map.png"})
+    for path, mock_response in MOCK_RESPONSES_BY_PATH:
+        if path in url:
+            return mock_response(*args, **kwargs)
 
     # Default fallback response
     return MockResponse(status_code=404, json_data={"error": "Mock endpoint not found"})
@@ -94,136 +88,141 @@ def mock_project_client():
     return MockAIProjectClient()
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="module", autouse=True)
+def mock_http():
+    """Route every Azure Maps call made from this module to the canned responses, patched once for the module."""
+    with patch("sales_functions._session.get", side_effect=mock_requests_get) as mock_get:
+        yield mock_get
+
+
+@pytest.fixture(scope="session")
 def setup_environment():
-    """Set up environment variables needed for testing."""
+    """Set up environment variables needed for testing and return the server URL."""
+    # Each pytest-xdist worker ("gw0", "gw1", ...) gets its own port so servers don't collide
+    port = 7861 + int(os.environ.get("PYTEST_XDIST_WORKER", "gw0")[2:])
     with patch.dict(
         os.environ,
         {
             "AZURE_MAPS_KEY": "mock-key-for-testing",
             "PROJECT_CONNECTION_STRING": "mock-connection-string",
             "MODEL_DEPLOYMENT_NAME": "gpt-4o",
-            "GRADIO_SERVER_PORT": "7861",  # Use a different port for tests
+            "GRADIO_SERVER_PORT": str(port),  # Use a different port for tests
             "GRADIO_SERVER_NAME": "127.0.0.1",  # Use localhost for tests
         },
     ):
-        yield
+        yield f"http://127.0.0.1:{port}/"
+
+
+@pytest.fixture(scope="session")
+def gradio_server(setup_environment, tmp_path_factory):
+    """Launch the Gradio app in-process once for all UI tests and return its URL."""
+    # main builds its project client at import, so the mock has to be in place before the import
+    with patch("azure.ai.projects.AIProjectClient.from_connection_string", return_value=MockAIProjectClient()):
+        main = importlib.import_module("main")
+
+    with patch.object(main, "AGENT_ID_FILE", tmp_path_factory.mktemp("agent") / ".sales_agent_id"):
+        app = main.build_app()
+        # Returns once the server accepts connections
+        app.queue().launch(
+            server_name="127.0.0.1",
+            server_port=int(os.environ["GRADIO_SERVER_PORT"]),
+            prevent_thread_lock=True,
+            show_error=True,
+        )
+        try:
+            yield setup_environment
+        finally:
+            app.close()
+
+
+@pytest.fixture(scope="session")
+def shared_page(browser, gradio_server):
+    """Open the app once in a browser page shared by all UI tests."""
+    context = browser.new_context()
+    app_page = context.new_page()
+    app_page.goto(gradio_server)
+    yield app_page
+    context.close()
+
+
+@pytest.fixture
+def page(shared_page):
+    """Reuse the shared page, clearing the chat instead of reloading the app."""
+    shared_page.locator('button:text("Clear Chat History")').click()
+    expect(shared_page.locator(".chat-area .message-wrap")).to_have_count(0)
+    return shared_page
 
 
 @pytest.mark.ui
-def test_chat_interface_basic_interaction(setup_environment, mock_project_client, page: Page):
+def test_chat_interface_basic_interaction(mock_project_client, page: Page):
     """Test basic interaction with the chat interface."""
     # Mock the required services
     with (
         patch("main.AIProjectClient.from_connection_string", return_value=mock_project_client),
         patch("main.project_client", mock_project_client),
-        patch("requests.get", side_effect=mock_requests_get),
     ):
 
-        # Start the Gradio server in a separate process
-        # Launch the server with a 3 second timeout to ensure it starts up
-        server = subprocess.Popen(["python", "main.py"], preexec_fn=os.setsid)
-        time.sleep(3)  # Wait for the server to start
+        # Verify the page title
+        expect(page.locator("h2")).to_contain_text("Sales Planning Assistant")
 
-        try:
-            # Visit the Gradio UI
-            page.goto("http://127.0.0.1:7861/")
-
-            # Verify the page title
-            expect(page.locator("h2")).to_contain_text("Sales Planning Assistant")
-
-            # Check example questions are displayed
-            expect(page.locator('button:text("Who are my clients today?")')).to_be_visible()
-
-            # Type a message in the chat input
-            chat_input = page.locator("textarea.input-area")
-            chat_input.fill("Who are my clients today?")
-            chat_input.press("Enter")
+        # Check example questions are displayed
+        expect(page.locator('button:text("Who are my clients today?")')).to_be_visible()
 
-            # Wait for the response to appear in the chat
-            time.sleep(1)
+        # Type a message in the chat input
+        chat_input = page.locator("textarea.input-area")
+        chat_input.fill("Who are my clients today?")
+        chat_input.press("Enter")
 
-            # Wait a bit for the full response
-            time.sleep(2)
+        # Check that the response contains client names
+        assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
+        expect(assistant_message).to_contain_text("your clients for today")
 
-            # Check that the response contains client names
-            assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
-            expect(assistant_message).to_contain_text("your clients for today")
+        # Test clicking on example button
+        route_button = page.locator('button:text("Plan my optimal rout")')
+        route_button.click()
 
-            # Test clicking on example button
-            route_button = page.locator('button:text("Plan my optimal rout")')
-            route_button.click()
+        # Verify the route planning response
+        assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
+        expect(assistant_message).to_contain_text("planned your optimal route")
 
-            # Wait for the response
-            time.sleep(2)
+        # Test clear chat history
+        clear_button = page.locator('button:text("Clear Chat History")')
+        clear_button.click()
 
-            # Verify the route planning response
-            assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
-            expect(assistant_message).to_contain_text("planned your optimal route")
-
-            # Test clear chat history
-            clear_button = page.locator('button:text("Clear Chat History")')
-            clear_button.click()
-
-            # Check that the chat is cleared
-            chat_area = page.locator(".chat-area")
-            expect(chat_area.locator(".message-wrap")).to_have_count(0)
-
-        finally:
-            # Stop the Gradio server
-            os.killpg(os.getpgid(server.pid), signal.SIGTERM)
+        # Check that the chat is cleared
+        chat_area = page.locator(".chat-area")
+        expect(chat_area.locator(".message-wrap")).to_have_count(0)
 
 
 @pytest.mark.ui
-def test_chat_interface_tool_interactions(setup_environment, mock_project_client, page: Page):
+def test_chat_interface_tool_interactions(mock_project_client, page: Page):
     """Test interactions with tools in the chat interface."""
     with (
         patch("main.AIProjectClient.from_connection_string", return_value=mock_project_client),
         patch("main.project_client", mock_project_client),
-        patch("requests.get", side_effect=mock_requests_get),
     ):
 
-        server = subprocess.Popen(["python", "main.py"], preexec_fn=os.setsid)
-        time.sleep(3)  # Wait for the server to start
+        # Type a message to request a map
+        chat_input = page.locator("textarea.input-area")
+        chat_input.fill("Show me a map of my next location")
+        chat_input.press("Enter")
 
-        try:
-            # Visit the Gradio UI
-            page.goto("http://127.0.0.1:7861/")
-
-            # Type a message to request a map
-            chat_input = page.locator("textarea.input-area")
-            chat_input.fill("Show me a map of my next location")
-            chat_input.press("Enter")
-
-            # Wait for the response
-            time.sleep(3)
-
-            # Check for the map response
-            assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
-            expect(assistant_message).to_contain_text("Here's a map")
+        # Check for the map response
+        assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
+        expect(assistant_message).to_contain_text("Here's a map")
 
-            # Type a message to get the next visit
-            chat_input.fill("What is my next visit?")
-            chat_input.press("Enter")
+        # Type a message to get the next visit
+        chat_input.fill("What is my next visit?")
+        chat_input.press("Enter")
 
-            # Wait for the response
-            time.sleep(3)
+        # Check that we get information about the next client visit
+        assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
+        expect(assistant_message).to_contain_text("Your next visit is")
 
-            # Check that we get information about the next client visit
-            assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
-            expect(assistant_message).to_contain_text("Your next visit is")
+        # Reset the day
+        chat_input.fill("Reset my day")
+        chat_input.press("Enter")
 
-            # Reset the day
-            chat_input.fill("Reset my day")
-            chat_input.press("Enter")
-
-            # Wait for the response
-            time.sleep(3)
-
-            # Check the reset confirmation
-            assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
-            expect(assistant_message).to_contain_text("Sales day has been reset")
-
-        finally:
-            # Stop the Gradio server
-            os.killpg(os.getpgid(server.pid), signal.SIGTERM)
+        # Check the reset confirmation
+        assistant_message = page.locator(".chat-area .message-wrap:last-child div.agent div.md")
+        expect(assistant_message).to_contain_text("Sales day has been reset")